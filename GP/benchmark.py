@@ -0,0 +1,402 @@
+__author__ = 'AT'
+
+import itertools
+import json
+import sys
+import time
+
+from GPy.util.linalg import mdot
+from scipy.linalg import cho_solve
+from scipy.misc import logsumexp
+import numpy as np
+
+from data_source import DataSource
+from ExtRBF import ExtRBF
+from likelihood import UnivariateGaussian, MultivariateGaussian, LogGaussianCox, LogisticLL, SoftmaxLL, WarpLL, \
+    CogLL
+from mog_diag import MoG_Diag
+from savigp import Configuration
+from savigp_diag import SAVIGP_Diag
+from savigp_full import SAVIGP_Full
+from savigp_single_comp import SAVIGP_SingleComponent
+from util import jitchol, inv_chol, log_diag_gaussian, get_git
+
+
+class Benchmark:
+    """
+    Micro-benchmarks for the numerical building blocks of the SAVIGP models.
+    """
+
+    def __init__(self):
+        pass
+
+    @staticmethod
+    def _time(f, repeats):
+        """
+        Calls ``f`` ``repeats`` times and returns the best running time and the output of the last call.
+        """
+        best = float('Inf')
+        out = None
+        for r in range(repeats):
+            start = time.time()
+            out = f()
+            best = min(best, time.time() - start)
+        return best, out
+
+    @staticmethod
+    def _kernel_matrix(M, input_dim=5, latent_noise=0.001):
+        """
+        Builds a kernel matrix of size M * M on random inputs, similar to K(Z[j], Z[j]) in SAVIGP.
+        """
+        np.random.seed(12000)
+        Z = np.random.uniform(low=-1.0, high=1.0, size=(M, input_dim))
+        kernel = ExtRBF(input_dim, variance=1.0, lengthscale=np.array((1.,)), ARD=False)
+        return kernel.K(Z) + latent_noise * np.eye(M)
+
+    @staticmethod
+    def inverse_vs_solve(sizes=(100, 500, 2000), num_comp=2, repeats=3):
+        """
+        Compares explicit inverses of K(Z, Z) (formed by ``inv_chol``) with triangular solves against the Cholesky
+        decomposition, for the products with K^-1 used in the gradients of the cross term and of ``A``:
+
+         w = K^-1 m,  and  dcross \\ dK = K^-1 - K^-1 P K^-1
+
+        Timings are the best of ``repeats`` runs; errors are the relative residuals ||K w - m|| / ||m||.
+
+        Returns
+        -------
+        results : list
+         a list of dictionaries, one for each size in ``sizes``
+        """
+
+        results = []
+        for M in sizes:
+            K = Benchmark._kernel_matrix(M)
+            L = jitchol(K)
+            m = np.random.normal(0, 1, (M, num_comp))
+            P = mdot(m, m.T) + np.eye(M)
+            eye = np.eye(M)
+
+            def inv_path():
+                invZ = inv_chol(L)
+                return mdot(invZ, m), invZ - mdot(invZ, P, invZ)
+
+            def solve_path():
+                return cho_solve((L, True), m), cho_solve((L, True), eye - cho_solve((L, True), P).T)
+
+            t_inv, (w_inv, _) = Benchmark._time(inv_path, repeats)
+            t_solve, (w_solve, _) = Benchmark._time(solve_path, repeats)
+            res = {'benchmark': 'inverse_vs_solve',
+                   'M': M,
+                   'time_inverse': t_inv,
+                   'time_solve': t_solve,
+                   'error_inverse': np.linalg.norm(mdot(K, w_inv) - m) / np.linalg.norm(m),
+                   'error_solve': np.linalg.norm(mdot(K, w_solve) - m) / np.linalg.norm(m)}
+            print('M=%(M)d  inverse: %(time_inverse).4fs (err %(error_inverse).2e)  '
+                  'solve: %(time_solve).4fs (err %(error_solve).2e)' % res)
+            results.append(res)
+        return results
+
+    @staticmethod
+    def diag_mog_update(num_comps=(1, 2, 5, 10, 20), num_process=10, num_dim=50, repeats=5):
+        """
+        Compares the Python loops over (k, l, j) previously used in ``MoG_Diag._update`` and
+        ``SAVIGP_Diag.update_N_z`` with their vectorized implementations, as the number of components grows.
+
+        Returns
+        -------
+        results : list
+         a list of dictionaries, one for each number of components in ``num_comps``
+        """
+
+        results = []
+        for K in num_comps:
+            np.random.seed(12000)
+            mog = MoG_Diag(K, num_process, num_dim)
+            mog._random_init()
+            mog._update()
+            model = SAVIGP_Diag.__new__(SAVIGP_Diag)
+            model.MoG = mog
+            model.num_mog_comp = K
+            model.num_latent_proc = num_process
+            model.num_inducing = num_dim
+
+            def loop_path():
+                invC_klj_Sk = np.empty((K, K, num_process, num_dim))
+                log_N_kl = np.zeros((K, K))
+                log_z = np.zeros(K)
+                for k in range(K):
+                    for l in range(K):
+                        for j in range(num_process):
+                            invC_klj_Sk[k, l, j] = MoG_Diag._s_k_skl(mog.log_s[k, j], mog.log_s[l, j])
+                            log_N_kl[k, l] += log_diag_gaussian(mog.m[k, j], mog.m[l, j],
+                                                                logsumexp([mog.log_s[k, j], mog.log_s[l, j]], axis=0))
+                    log_z[k] = logsumexp(log_N_kl[k, :] + np.log(mog.pi))
+                return invC_klj_Sk, log_N_kl, log_z
+
+            def vectorized_path():
+                mog._update()
+                model.update_N_z()
+                return mog.invC_klj_Sk, model.log_N_kl, model.log_z
+
+            t_loop, out_loop = Benchmark._time(loop_path, repeats)
+            t_vec, out_vec = Benchmark._time(vectorized_path, repeats)
+            res = {'benchmark': 'diag_mog_update',
+                   'K': K,
+                   'time_loop': t_loop,
+                   'time_vectorized': t_vec,
+                   'max_diff': max([np.absolute(a - b).max() for a, b in zip(out_loop, out_vec)])}
+            print('K=%(K)d  loop: %(time_loop).5fs  vectorized: %(time_vectorized).5fs  (max diff %(max_diff).2e)'
+                  % res)
+            results.append(res)
+        return results
+
+    @staticmethod
+    def _build_model(method, X, Y, M, S, K, cond_ll):
+        """
+        Builds a model of type ``method`` ('diag', 'full' or 'full_mix') with ``M`` inducing points, ``S`` samples and
+        ``K`` mixture components ('full' always has a single component), and all the terms of the objective function
+        and the posterior and the hyper-parameters in the configuration.
+        """
+        num_latent = cond_ll.f_num if isinstance(cond_ll, CogLL) else \
+            (cond_ll.dim if isinstance(cond_ll, SoftmaxLL) else cond_ll.output_dim())
+        kernels = [ExtRBF(X.shape[1], variance=1.0, lengthscale=np.array((1.,)), ARD=False)
+                   for j in range(num_latent)]
+        config = [Configuration.MoG, Configuration.ENTROPY, Configuration.CROSS, Configuration.ELL,
+                  Configuration.HYPER]
+        np.random.seed(12000)
+        if method == 'diag':
+            return SAVIGP_Diag(X, Y, M, K, cond_ll, kernels, S, config, 0.001, False, True)
+        if method == 'full':
+            return SAVIGP_SingleComponent(X, Y, M, cond_ll, kernels, S, config, 0.001, False, True)
+        if method == 'full_mix':
+            return SAVIGP_Full(X, Y, M, K, cond_ll, kernels, S, config, 0.001, False, True)
+        raise ValueError('unknown method: ' + str(method))
+
+    @staticmethod
+    def _time_model(model, Xtest, Ytest, repeats):
+        """
+        Times the hot paths of ``model``:
+
+         'time_set_params': ``set_params`` with all the parameters changed, which calls ``_update``
+         'time_update_inverses': ``_update_inverses``, i.e., kernels of the inducing points and their decompositions
+         after a change in the hyper-parameters
+         'time_ell': ``_ell`` when A and the kernels are cached, i.e., after a change in the posterior
+         'time_predict': ``predict`` on (``Xtest``, ``Ytest``)
+        """
+        x = [model.get_params()]
+        x.append(x[0] + np.random.RandomState(0).normal(scale=1e-3, size=x[0].shape))
+        calls = [0]
+
+        def set_params():
+            calls[0] += 1
+            model.set_params(x[calls[0] % 2])
+
+        res = {}
+        res['time_set_params'], _ = Benchmark._time(set_params, repeats)
+        res['time_update_inverses'], _ = Benchmark._time(model._update_inverses, repeats)
+        res['time_ell'], _ = Benchmark._time(model._ell, repeats)
+        res['time_predict'], _ = Benchmark._time(lambda: model.predict(Xtest, Ytest), repeats)
+        return res
+
+    @staticmethod
+    def model_grid(methods=('diag', 'full'), N=(500, 2000), M=(20, 50), Q=(1, 2), S=(100, 1000), K=(1, 2),
+                   input_dim=3, num_test=500, repeats=3):
+        """
+        Times the hot paths of the models (see ``_time_model``) on synthetic data generated by
+        ``DataSource.normal_generate_samples``, over the grid of the number of training points (``N``), inducing
+        points (``M``), latent processes (``Q``), samples (``S``) and mixture components (``K``). The likelihood is
+        ``UnivariateGaussian`` when Q = 1, and ``SoftmaxLL`` otherwise. K > 1 is skipped for 'full'.
+
+        Returns
+        -------
+        results : list
+         a list of dictionaries, one for each point of the grid
+        """
+
+        results = []
+        for method, n, m, q, s, k in itertools.product(methods, N, M, Q, S, K):
+            if method == 'full' and k > 1:
+                continue
+            np.random.seed(12000)
+            X, Y, _ = DataSource.normal_generate_samples(n + num_test, np.eye(q) * 0.5, input_dim)
+            if q == 1:
+                cond_ll = UnivariateGaussian(np.array(0.5))
+            else:
+                # classification into the output with the largest value, since MultivariateGaussian does not
+                # implement prediction
+                cond_ll = SoftmaxLL(q)
+                Y = np.eye(q)[np.argmax(Y, axis=1)]
+            model = Benchmark._build_model(method, X[:n], Y[:n], m, s, k, cond_ll)
+            res = {'benchmark': 'model', 'method': method, 'N': n, 'M': m, 'Q': q, 'S': s, 'K': k}
+            res.update(Benchmark._time_model(model, X[n:], Y[n:], repeats))
+            print('%(method)s N=%(N)d M=%(M)d Q=%(Q)d S=%(S)d K=%(K)d  set_params: %(time_set_params).4fs  '
+                  'update_inverses: %(time_update_inverses).4fs  ell: %(time_ell).4fs  predict: %(time_predict).4fs'
+                  % res)
+            results.append(res)
+        return results
+
+    @staticmethod
+    def dataset_grid(datasets=('boston', 'wisconsin'), methods=('diag', 'full'), M=(50,), S=(1000,), K=(1,),
+                     repeats=3):
+        """
+        Times the hot paths of the models (see ``_time_model``) on the first split of the bundled datasets:
+        'boston' (``UnivariateGaussian``), 'wisconsin' (``LogisticLL``) and 'abalone' (``WarpLL``). Data is read
+        relative to the current directory, in the same way as ``DataSource``.
+
+        Returns
+        -------
+        results : list
+         a list of dictionaries, one for each dataset and point of the grid
+        """
+
+        loaders = {'boston': (DataSource.boston_data, lambda: UnivariateGaussian(np.array(1.0))),
+                   'wisconsin': (DataSource.wisconsin_breast_cancer_data, LogisticLL),
+                   'abalone': (DataSource.abalone_data,
+                               lambda: WarpLL(np.array([-2.0485, 1.7991, 1.5814]),
+                                              np.array([2.7421, 0.9426, 1.7804]),
+                                              np.array([0.1856, 0.7024, -0.7421]),
+                                              np.log(0.1)))}
+        results = []
+        for name in datasets:
+            loader, ll_class = loaders[name]
+            d = loader()[0]
+            for method, m, s, k in itertools.product(methods, M, S, K):
+                if method == 'full' and k > 1:
+                    continue
+                model = Benchmark._build_model(method, d['train_X'], d['train_Y'], m, s, k, ll_class())
+                res = {'benchmark': 'dataset', 'dataset': name, 'method': method, 'N': d['train_X'].shape[0],
+                       'M': m, 'S': s, 'K': k}
+                res.update(Benchmark._time_model(model, d['test_X'], d['test_Y'], repeats))
+                print('%(dataset)s %(method)s M=%(M)d S=%(S)d K=%(K)d  set_params: %(time_set_params).4fs  '
+                      'update_inverses: %(time_update_inverses).4fs  ell: %(time_ell).4fs  '
+                      'predict: %(time_predict).4fs' % res)
+                results.append(res)
+        return results
+
+    @staticmethod
+    def _likelihoods():
+        """
+        :returns: for each likelihood, a function which returns the likelihood, the number of latent processes, and a
+         function which generates ``N`` outputs
+        """
+        def gaussian(N, O):
+            return np.random.normal(0, 1, (N, O))
+
+        def one_hot(N, O):
+            return np.eye(O)[np.random.randint(0, O, N)]
+
+        return {'UnivariateGaussian': (lambda: UnivariateGaussian(np.array(0.5)), 1, lambda N: gaussian(N, 1)),
+                'MultivariateGaussian': (lambda: MultivariateGaussian(np.eye(3) * 0.5), 3, lambda N: gaussian(N, 3)),
+                'LogGaussianCox': (lambda: LogGaussianCox(0.), 1,
+                                   lambda N: np.random.poisson(1., (N, 1)).astype(float)),
+                'LogisticLL': (LogisticLL, 1, lambda N: np.sign(gaussian(N, 1))),
+                'SoftmaxLL': (lambda: SoftmaxLL(3), 3, lambda N: one_hot(N, 3)),
+                'WarpLL': (lambda: WarpLL(np.array([-2.0485, 1.7991, 1.5814]), np.array([2.7421, 0.9426, 1.7804]),
+                                          np.array([0.1856, 0.7024, -0.7421]), np.log(0.1)),
+                           1, lambda N: gaussian(N, 1)),
+                'CogLL': (lambda: CogLL(0.1, 2, 1), 3, lambda N: gaussian(N, 2))}
+
+    @staticmethod
+    def likelihood_grid(likelihoods=None, N=(100, 1000), S=(100, 1000), repeats=3):
+        """
+        Times ``ll_F_Y`` of each likelihood on S * N samples of the latent processes, which is the inner operation of
+        ``_ell``.
+
+        Parameters
+        ----------
+        likelihoods : list (optional)
+         names of the likelihoods (see ``_likelihoods``). All the likelihoods if None.
+
+        Returns
+        -------
+        results : list
+         a list of dictionaries, one for each likelihood and point of the grid
+        """
+
+        all_likelihoods = Benchmark._likelihoods()
+        if likelihoods is None:
+            likelihoods = sorted(all_likelihoods.keys())
+        results = []
+        for name in likelihoods:
+            ll_class, num_latent, generate_Y = all_likelihoods[name]
+            for n, s in itertools.product(N, S):
+                np.random.seed(12000)
+                ll = ll_class()
+                F = np.random.normal(0, 1, (s, n, num_latent))
+                Y = generate_Y(n)
+                t, _ = Benchmark._time(lambda: ll.ll_F_Y(F, Y), repeats)
+                res = {'benchmark': 'll_F_Y', 'likelihood': name, 'N': n, 'S': s, 'time_ll_F_Y': t}
+                print('%(likelihood)s N=%(N)d S=%(S)d  ll_F_Y: %(time_ll_F_Y).5fs' % res)
+                results.append(res)
+        return results
+
+    @staticmethod
+    def save(results, file_name):
+        """
+        Writes ``results`` to the JSON file ``file_name``, together with the current git commit.
+        """
+        git_hash, git_branch = get_git()
+        with open(file_name, 'w') as f:
+            json.dump({'git_hash': git_hash, 'git_branch': git_branch, 'time': time.time(), 'results': results}, f,
+                      indent=1, sort_keys=True)
+
+    @staticmethod
+    def load(file_name):
+        """
+        :returns: the results saved by ``save`` in ``file_name``
+        """
+        with open(file_name) as f:
+            return json.load(f)['results']
+
+    @staticmethod
+    def _key(res):
+        """
+        :returns: the configuration of a result, i.e., all its entries except the timings and errors, which is used
+         for matching results with the baseline
+        """
+        return tuple(sorted((k, v) for k, v in res.items() if not k.startswith('time_') and
+                            not k.startswith('error_') and k != 'max_diff'))
+
+    @staticmethod
+    def compare(results, baseline, tolerance=0.2, min_time=1e-3):
+        """
+        Compares ``results`` with the ``baseline`` results (e.g., loaded by ``load``), and reports the timings which
+        are slower than the baseline by more than ``tolerance``. Timings shorter than ``min_time`` in both results are
+        ignored, since they are dominated by noise.
+
+        Returns
+        -------
+        regressions : list
+         a list of dictionaries, containing the configuration ('config'), the timing ('time'), and its value in the
+         baseline ('baseline') and in ``results`` ('new'), for each regression
+        """
+
+        base = dict((Benchmark._key(res), res) for res in baseline)
+        regressions = []
+        for res in results:
+            key = Benchmark._key(res)
+            if key not in base:
+                continue
+            for name, t in res.items():
+                if not name.startswith('time_') or name not in base[key]:
+                    continue
+                t_base = base[key][name]
+                if max(t, t_base) < min_time:
+                    continue
+                if t > t_base * (1. + tolerance):
+                    regressions.append({'config': dict(key), 'time': name, 'baseline': t_base, 'new': t})
+                    print('regression: %s %s %.4fs -> %.4fs (%+.0f%%)' %
+                          (str(dict(key)), name, t_base, t, 100. * (t / t_base - 1)))
+        print('%d regressions in %d results' % (len(regressions), len(results)))
+        return regressions
+
+
+if __name__ == '__main__':
+    # python benchmark.py [output.json [baseline.json]]
+    results = Benchmark.inverse_vs_solve() + Benchmark.diag_mog_update() + Benchmark.likelihood_grid() + \
+        Benchmark.model_grid()
+    if len(sys.argv) > 1:
+        Benchmark.save(results, sys.argv[1])
+    if len(sys.argv) > 2:
+        Benchmark.compare(results, Benchmark.load(sys.argv[2]))
@@ -0,0 +1,167 @@
+__author__ = 'AT'
+
+import glob
+import os
+import threading
+import numpy as np
+
+from util import check_dir_exists
+
+
+class CheckpointWriter:
+    """
+    Writes checkpoints of the optimisation in a background thread, so that the optimisation is not blocked while they
+    are written.
+
+    Each checkpoint is a numpy ``.npz`` file which contains the image of the model and the state of the optimiser. It
+    is first written to a temporary file, which is synced to the disk and then renamed to ``checkpoint_<iter>.npz``,
+    after which the folder is synced (on POSIX systems) so that the rename itself is durable. Therefore a crash during
+    writing does not corrupt the existing checkpoints. Only the last ``keep`` checkpoints
+    are kept.
+
+    If a checkpoint is submitted while the previous one is still being written, it is skipped. The last skipped
+    checkpoint is written by ``close`` if no later checkpoint has been written.
+
+    Parameters
+    ----------
+    path : string
+     the folder in which checkpoints are written
+
+    keep : int
+     number of checkpoints to keep
+
+    logger : logger (optional)
+     logger used for reporting skipped and failed checkpoints
+    """
+
+    def __init__(self, path, keep=3, logger=None):
+        self.path = path
+        self.keep = keep
+        self.logger = logger
+        self._thread = None
+        self._skipped = None
+        self.num_written = 0
+        self.num_skipped = 0
+        self.error = None
+        """ the last error raised while writing a checkpoint """
+
+    def submit(self, current_iter, image, opt_params):
+        """
+        Writes a checkpoint in the background, unless the previous checkpoint is still being written. ``image`` and
+        ``opt_params`` should not be modified after they are submitted (``SAVIGP.image`` returns copies).
+
+        Parameters
+        ----------
+        current_iter : int
+         iteration of the optimisation, which is used in the name of the checkpoint
+
+        image : dictionary
+         image of the model (``SAVIGP.image``)
+
+        opt_params : dictionary
+         state of the optimiser, e.g., {'current_iter': .., 'total_evals': .., 'obj_fun': ..}. ``None`` values are
+         stored as NaN.
+
+        Returns
+        -------
+        :returns: whether the checkpoint is being written (False if it was skipped)
+        """
+        arrays = self._to_arrays(image, opt_params)
+        if self._thread is not None and self._thread.is_alive():
+            self._skipped = (current_iter, arrays)
+            self.num_skipped += 1
+            if self.logger is not None:
+                self.logger.debug('checkpoint skipped: ' + str(current_iter))
+            return False
+        self._skipped = None
+        self._thread = threading.Thread(target=self._write, args=(current_iter, arrays))
+        self._thread.start()
+        return True
+
+    def close(self):
+        """
+        Waits for the checkpoint being written, and then writes the last skipped checkpoint if there is one.
+        """
+        if self._thread is not None:
+            self._thread.join()
+        if self._skipped is not None:
+            self._write(*self._skipped)
+            self._skipped = None
+
+    @staticmethod
+    def _to_arrays(image, opt_params):
+        arrays = {}
+        for k, v in image.items():
+            arrays['image_' + k] = np.asarray(v)
+        for k, v in opt_params.items():
+            arrays['opt_' + k] = np.asarray(float('NaN') if v is None else v)
+        return arrays
+
+    def _write(self, current_iter, arrays):
+        file_name = self.path + 'checkpoint_%06d.npz' % current_iter
+        tmp_name = file_name + '.tmp'
+        try:
+            check_dir_exists(self.path)
+            with open(tmp_name, 'wb') as f:
+                np.savez(f, **arrays)
+                f.flush()
+                os.fsync(f.fileno())
+            os.rename(tmp_name, file_name)
+            self._sync_dir()
+            self.num_written += 1
+            for old in checkpoint_files(self.path)[:-self.keep]:
+                os.remove(old)
+        except (IOError, OSError) as e:
+            self.error = e
+            if self.logger is not None:
+                self.logger.warning('checkpoint ' + str(current_iter) + ' failed: ' + str(e))
+
+    def _sync_dir(self):
+        """
+        Syncs the folder of the checkpoints, so that the rename of a checkpoint is written to the disk (POSIX only).
+        """
+        if os.name != 'posix':
+            return
+        fd = os.open(self.path, os.O_RDONLY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+
+def checkpoint_files(path):
+    """
+    :returns: the checkpoints in the folder ``path``, ordered from the oldest to the newest
+    """
+    return sorted(glob.glob(path + 'checkpoint_*.npz'))
+
+
+def load_checkpoint(path):
+    """
+    Loads the newest checkpoint written by ``CheckpointWriter`` in the folder ``path``.
+
+    Returns
+    -------
+    image : dictionary
+     image of the model
+
+    opt_params : dictionary
+     state of the optimiser. NaN values which were stored for ``None`` are returned as ``None``.
+    """
+    files = checkpoint_files(path)
+    if not files:
+        raise IOError('no checkpoint found in ' + path)
+    data = np.load(files[-1])
+    image = {}
+    opt_params = {}
+    for k in data.files:
+        if k.startswith('image_'):
+            image[k[len('image_'):]] = data[k]
+        elif k.startswith('opt_'):
+            v = data[k]
+            if v.ndim == 0:
+                v = v.item()
+                if isinstance(v, float) and np.isnan(v):
+                    v = None
+            opt_params[k[len('opt_'):]] = v
+    return image, opt_params
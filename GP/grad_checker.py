@@ -1,7 +1,9 @@
 __author__ = 'AT'
 
+import multiprocessing
 from DerApproximator import get_d1
 from numpy import concatenate
+import numpy as np
 from texttable import Texttable
 
 
@@ -11,7 +13,7 @@ class GradChecker:
         pass
 
     @staticmethod
-    def check(f, f_grad, x0, name, verbose=False):
+    def check(f, f_grad, x0, name, verbose=False, num_coords=None, seed=0, n_processes=1):
         """
         Checks whether gradients of function ``f`` at point x0 is same as the gradients provided by ``f_grad``.
         ``error`` is the difference between numerical and provided gradients.
@@ -35,27 +37,43 @@ class GradChecker:
         verbose : boolean
          whether to print output for each parameter separately
 
+        num_coords : int (optional)
+         if provided, only ``num_coords`` parameters, which are sampled uniformly (using ``seed``), are checked
+
+        seed : int
+         seed used for sampling the parameters
+
+        n_processes : int
+         number of processes used for calculating numerical gradients. Each process evaluates ``f`` on its own copy
+         of the state of the parent process (e.g., the model), and therefore ``f`` should not depend on changes
+         made in other processes. If None, the number of CPUs is used.
+
         Returns
         -------
         avg : float
-         average of the percentage error over all the parameters, i.e., mean(%error)
+         average of the percentage error over the checked parameters, i.e., mean(%error)
         """
 
         g = f_grad(x0)
         if len(g) != len(x0):
             raise Exception('dimensions mismatch')
+        coords = range(len(x0))
+        if num_coords is not None and num_coords < len(x0):
+            coords = sorted(np.random.RandomState(seed).choice(len(x0), num_coords, replace=False))
         table = Texttable()
         table.set_cols_align(["l", "r", "c", "c", "c"])
         table.set_cols_valign(["t", "m", "b" , "r", "c"])
         rows = []
         rows += [["Name  ", "analytical  ", "numerical   ", "error   ", "% error   "]]
         if verbose:
-            print 'dimensions:', len(x0)
+            print 'dimensions:', len(x0), 'checked:', len(coords)
+        _check_state.update({'f': f, 'x0': x0})
+        try:
+            numerical = GradChecker._map(_coordinate_worker, coords, n_processes)
+        finally:
+            _check_state.clear()
         aver_error = 0
-        for i in range(len(x0)):
-            def f_i(x):
-                return f((concatenate((x0[:i], x, x0[(i+1):]))))
-            t = get_d1(f_i, [x0[i]])
+        for i, t in zip(coords, numerical):
             p_errro=None
             if t != 0:
                 p_errro = abs(t-g[i]) / abs(t)
@@ -69,4 +87,116 @@ class GradChecker:
         table.add_rows(rows)
         if verbose:
             print(table.draw())
-        return aver_error / len(x0)
\ No newline at end of file
+        return aver_error / len(coords)
+
+    @staticmethod
+    def check_directional(f, f_grad, x0, num_directions=5, eps=1e-6, seed=0, verbose=False, n_processes=1):
+        r"""
+        Checks gradients of function ``f`` at point x0 along random directions. For each unit direction v, the
+        directional derivative g^T v, where g is provided by ``f_grad``, is compared with the central difference:
+
+         (f(x0 + eps v) - f(x0 - eps v)) / (2 eps)
+
+        which needs two evaluations of ``f`` for each direction, independently of the number of parameters.
+
+        Parameters
+        ----------
+        f : callable
+         input function to check gradients against
+
+        f_grad : callable
+         input function which provides gradients
+
+        x0 : ndarray
+         the point at which gradients should be calculated
+
+        num_directions : int
+         number of random directions
+
+        eps : float
+         step size of the central differences
+
+        seed : int
+         seed used for generating the directions
+
+        verbose : boolean
+         whether to print output for each direction
+
+        n_processes : int
+         number of processes used for evaluating ``f`` (see ``check``)
+
+        Returns
+        -------
+        avg : float
+         average of the percentage error over the directions, i.e., mean(abs(error) / abs(numerical))
+        """
+
+        g = f_grad(x0)
+        if len(g) != len(x0):
+            raise Exception('dimensions mismatch')
+        V = np.random.RandomState(seed).normal(size=(num_directions, len(x0)))
+        V /= np.sqrt(np.square(V).sum(axis=1))[:, np.newaxis]
+        points = [x0 + s * eps * v for v in V for s in [1., -1.]]
+        _check_state.update({'f': f})
+        try:
+            f_points = np.array(GradChecker._map(_point_worker, points, n_processes))
+        finally:
+            _check_state.clear()
+        numerical = (f_points[0::2] - f_points[1::2]) / (2 * eps)
+        analytical = np.dot(V, g)
+        table = Texttable()
+        table.set_cols_align(["l", "r", "c", "c", "c"])
+        rows = [["Direction  ", "analytical  ", "numerical   ", "error   ", "% error   "]]
+        aver_error = 0
+        for d in range(num_directions):
+            error = abs(numerical[d] - analytical[d])
+            p_errro = None
+            if numerical[d] != 0:
+                p_errro = error / abs(numerical[d])
+            rows += [[d, analytical[d], numerical[d], error, p_errro]]
+            if abs(analytical[d]) < 1e-4 and abs(numerical[d]) < 1e-4:
+                pass
+            else:
+                aver_error += error / abs(numerical[d])
+        table.add_rows(rows)
+        if verbose:
+            print 'dimensions:', len(x0), 'directions:', num_directions
+            print(table.draw())
+        return aver_error / num_directions
+
+    @staticmethod
+    def _map(func, args, n_processes):
+        """
+        Applies ``func`` to each element of ``args``, in a pool of ``n_processes`` processes if it is not 1.
+        """
+        if n_processes == 1:
+            return [func(a) for a in args]
+        pool = multiprocessing.Pool(n_processes)
+        try:
+            return pool.map(func, args)
+        finally:
+            pool.close()
+            pool.join()
+
+
+_check_state = {}
+""" arguments of the checks, which are inherited by the processes of the pool """
+
+
+def _coordinate_worker(i):
+    """
+    :returns: numerical derivative of ``f`` wrt to coordinate ``i`` at ``x0`` (arguments of ``GradChecker.check``)
+    """
+    f = _check_state['f']
+    x0 = _check_state['x0']
+
+    def f_i(x):
+        return f((concatenate((x0[:i], x, x0[(i+1):]))))
+    return get_d1(f_i, [x0[i]])
+
+
+def _point_worker(x):
+    """
+    :returns: ``f`` at ``x`` (argument of ``GradChecker.check_directional``)
+    """
+    return _check_state['f'](x)
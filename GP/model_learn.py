@@ -1,4 +1,5 @@
 import logging
+import os
 import pickle
 import csv
 
@@ -7,9 +8,13 @@ import numpy as np
 
 from savigp import SAVIGP
 from savigp_diag import SAVIGP_Diag
+from savigp_full import SAVIGP_Full
+from savigp_low_rank import SAVIGP_LowRank
+from savigp_reparam import SAVIGP_Reparam
 from savigp_single_comp import SAVIGP_SingleComponent
-from optimizer import Optimizer
+from optimizer import Optimizer, EarlyStopping
 from util import id_generator, check_dir_exists, get_git
+from checkpoint import CheckpointWriter, load_checkpoint
 
 
 class ModelLearn:
@@ -247,38 +252,55 @@ class ModelLearn:
 
 
     @staticmethod
-    def opt_callback(name):
+    def opt_callback(checkpoint):
         """
-        A callback function which will be called by the optimiser to save the model
+        A callback function which will be called by the optimiser to save the model. The model and the state of the
+        optimiser are copied, and are written in the background by ``checkpoint``.
 
         Parameters
         ----------
-        name : string
-         name of the folder to save the model in.
+        checkpoint : CheckpointWriter
+         the writer of the checkpoints.
         """
 
         def callback(model, current_iter, total_evals, delta_m, delta_s, obj_track):
-            path = ModelLearn.get_output_path() + name + '/'
-            check_dir_exists(path)
-            pickle.dump(model.image(), open(path + 'model.dump', 'w'))
-            pickle.dump({
+            checkpoint.submit(current_iter, model.image(), {
                 'current_iter': current_iter,
                 'total_evals': total_evals,
                 'delta_m': delta_m,
                 'delta_s': delta_s,
-                'obj_track': obj_track,
+                'obj_track': list(obj_track),
                 'obj_fun': model.objective_function()
-            },
-                open(path + 'opt.dump', 'w'))
+            })
 
         return callback
 
+    @staticmethod
+    def load_image(model_image_file):
+        """
+        Loads the image of a model and the state of the optimiser from the folder ``model_image_file``, which
+        contains either the checkpoints written by ``CheckpointWriter`` or 'model.dump' and 'opt.dump'.
+
+        Returns
+        -------
+        model_image : dictionary
+         image of the model
+
+        opt_params : dictionary
+         state of the optimiser
+        """
+        if os.path.exists(model_image_file + 'model.dump'):
+            return pickle.load(open(model_image_file + 'model.dump', 'rb')), \
+                pickle.load(open(model_image_file + 'opt.dump', 'rb'))
+        return load_checkpoint(model_image_file)
+
 
     @staticmethod
     def run_model(Xtest, Xtrain, Ytest, Ytrain, cond_ll, kernel, method, name, run_id, num_inducing, num_samples,
                   sparsify_factor, to_optimize, trans_class, random_Z, logging_level, export_X,
                   latent_noise=0.001, opt_per_iter=None, max_iter=200, n_threads=1, model_image_file=None,
-                  xtol=1e-3, ftol=1e-5, partition_size=3000):
+                  xtol=1e-3, ftol=1e-5, partition_size=3000, optimizers=None, Xval=None, Yval=None,
+                  val_every=1, val_patience=5, rank=5):
         """
         Fits a model to the data (Xtrain, Ytrain) using the method provided by 'method', and makes predictions on
          'Xtest' and 'Ytest', and exports the result to csv files.
@@ -305,7 +327,9 @@ class ModelLearn:
          number of latent processes. Each element should provide interface similar to ``ExtRBF`` class
 
         method : string
-         The method to use to learns the model. It can be 'full', 'mix1', and 'mix2'
+         The method to use to learns the model. It can be 'full', 'mix1', 'mix2', 'full_mix2' (mixture of two
+         Gaussians with full covariance matrices), 'low_rank' (a Gaussian with diagonal plus low-rank covariance), and
+         'full_reparam' (same as 'full' in the whitened parameterisation)
 
         name : string
          The name that will be used for logger file names, and results files names
@@ -326,7 +350,8 @@ class ModelLearn:
 
         to_optimize : list
          The set of parameters to optimize. It should be a list, and it can include 'll', 'mog', 'hyp', 'inducing' e.g.,
-         it can be ['ll', 'mog'] in which case posterior and ll will be optimised.
+         it can be ['ll', 'mog'] in which case posterior and ll will be optimised. If it includes 'joint', the
+         parameters are optimised jointly (see ``Optimizer.optimize_model``), and ``opt_per_iter`` should contain 'joint'.
 
         trans_class : subclass of DataTransformation
          The class which will be used to transform data.
@@ -356,7 +381,8 @@ class ModelLearn:
          Maximum number of threads used.
 
         model_image_file: string
-         The image file from the which the model will be initialized.
+         The folder from which the model will be initialized. It can contain the checkpoints of a previous run
+         (the newest one is used), or 'model.dump' and 'opt.dump'.
 
         xtol: float
          Tolerance of 'X' below which the optimization is determined as converged.
@@ -369,6 +395,27 @@ class ModelLearn:
          Training data will be split to the partitions of size ``partition_size`` and calculations will be done on each
          partition separately. This aim of this partitioning of data is to make algorithm memory efficient.
 
+        optimizers: dictionary
+         The optimiser to use for each subset of parameters, e.g., {'mog': 'ngd'} (see ``Optimizer.optimize_model``).
+
+        Xval : ndarray (optional)
+         X of validation points. If provided, NLPD and the error on the validation points are evaluated every
+         ``val_every`` iterations, the optimisation is stopped when NLPD has not improved for ``val_patience``
+         evaluations, and the parameters with the lowest NLPD are used for prediction (see ``EarlyStopping``).
+
+        Yval : ndarray (optional)
+         Y of validation points
+
+        val_every: integer
+         Number of iterations between evaluations on the validation points.
+
+        val_patience: integer
+         Number of evaluations without improvement on the validation points after which the optimisation is stopped.
+
+        rank: integer
+         Rank of the low-rank part of the covariance matrices of the posterior. Only used when ``method`` is
+         'low_rank' (see ``SAVIGP_LowRank``).
+
         Returns
         -------
         folder : string
@@ -386,6 +433,9 @@ class ModelLearn:
         Ytest = transformer.transform_Y(Ytest)
         Xtrain = transformer.transform_X(Xtrain)
         Xtest = transformer.transform_X(Xtest)
+        if Xval is not None:
+            Yval = transformer.transform_Y(Yval)
+            Xval = transformer.transform_X(Xval)
 
         opt_max_fun_evals = None
         total_time = None
@@ -409,17 +459,24 @@ class ModelLearn:
                       'git_branch': git_branch,
                       'random_Z': random_Z,
                       'latent_noise:': latent_noise,
-                      'model_init': model_image_file
+                      'model_init': model_image_file,
+                      'optimizers': optimizers,
+                      'rank': rank,
+                      'validation': None if Xval is None else {'size': Xval.shape[0], 'every': val_every,
+                                                               'patience': val_patience}
                       }
 
         logger = ModelLearn.get_logger(ModelLearn.get_output_path() + folder_name, folder_name, logging_level)
         logger.info('experiment started for:' + str(properties))
+        checkpoint = CheckpointWriter(ModelLearn.get_output_path() + folder_name + '/', logger=logger)
+        validation = None
+        if Xval is not None:
+            validation = EarlyStopping(Xval, Yval, logger, every=val_every, patience=val_patience)
 
         model_image = None
         current_iter = None
         if model_image_file is not None:
-            model_image = pickle.load(open(model_image_file + 'model.dump'))
-            opt_params = pickle.load(open(model_image_file + 'opt.dump'))
+            model_image, opt_params = ModelLearn.load_image(model_image_file)
             current_iter = opt_params['current_iter']
 
         if model_image:
@@ -431,26 +488,55 @@ class ModelLearn:
                                        image=model_image, partition_size=partition_size)
             _, timer_per_iter, total_time, tracker, total_evals = \
                 Optimizer.optimize_model(m, opt_max_fun_evals, logger, to_optimize, xtol, opt_per_iter, max_iter, ftol,
-                                         ModelLearn.opt_callback(folder_name), current_iter)
+                                         ModelLearn.opt_callback(checkpoint), current_iter,
+                                         optimizers, validation=validation)
         if method == 'mix1':
             m = SAVIGP_Diag(Xtrain, Ytrain, num_inducing, 1, cond_ll,
                             kernel, num_samples, None, latent_noise, False, random_Z, n_threads=n_threads,
                             image=model_image, partition_size=partition_size)
             _, timer_per_iter, total_time, tracker, total_evals = \
                 Optimizer.optimize_model(m, opt_max_fun_evals, logger, to_optimize, xtol, opt_per_iter, max_iter, ftol,
-                                         ModelLearn.opt_callback(folder_name), current_iter)
+                                         ModelLearn.opt_callback(checkpoint), current_iter,
+                                         optimizers, validation=validation)
         if method == 'mix2':
             m = SAVIGP_Diag(Xtrain, Ytrain, num_inducing, 2, cond_ll,
                             kernel, num_samples, None, latent_noise, False, random_Z, n_threads=n_threads,
                             image=model_image, partition_size=partition_size)
             _, timer_per_iter, total_time, tracker, total_evals = \
                 Optimizer.optimize_model(m, opt_max_fun_evals, logger, to_optimize, xtol, opt_per_iter, max_iter, ftol,
-                                         ModelLearn.opt_callback(folder_name), current_iter)
+                                         ModelLearn.opt_callback(checkpoint), current_iter,
+                                         optimizers, validation=validation)
+        if method == 'full_mix2':
+            m = SAVIGP_Full(Xtrain, Ytrain, num_inducing, 2, cond_ll,
+                            kernel, num_samples, None, latent_noise, False, random_Z, n_threads=n_threads,
+                            image=model_image, partition_size=partition_size)
+            _, timer_per_iter, total_time, tracker, total_evals = \
+                Optimizer.optimize_model(m, opt_max_fun_evals, logger, to_optimize, xtol, opt_per_iter, max_iter, ftol,
+                                         ModelLearn.opt_callback(checkpoint), current_iter,
+                                         optimizers, validation=validation)
+        if method == 'low_rank':
+            m = SAVIGP_LowRank(Xtrain, Ytrain, num_inducing, 1, cond_ll,
+                               kernel, num_samples, None, latent_noise, False, random_Z, n_threads=n_threads,
+                               image=model_image, partition_size=partition_size, rank=rank)
+            _, timer_per_iter, total_time, tracker, total_evals = \
+                Optimizer.optimize_model(m, opt_max_fun_evals, logger, to_optimize, xtol, opt_per_iter, max_iter, ftol,
+                                         ModelLearn.opt_callback(checkpoint), current_iter,
+                                         optimizers, validation=validation)
+        if method == 'full_reparam':
+            m = SAVIGP_Reparam(Xtrain, Ytrain, num_inducing, cond_ll,
+                               kernel, num_samples, None, latent_noise, False, random_Z, n_threads=n_threads,
+                               image=model_image, partition_size=partition_size)
+            _, timer_per_iter, total_time, tracker, total_evals = \
+                Optimizer.optimize_model(m, opt_max_fun_evals, logger, to_optimize, xtol, opt_per_iter, max_iter, ftol,
+                                         ModelLearn.opt_callback(checkpoint), current_iter,
+                                         optimizers, validation=validation)
         if method == 'gp':
             m = GPy.models.GPRegression(Xtrain, Ytrain, kernel[0])
             if 'll' in to_optimize and 'hyp' in to_optimize:
                 m.optimize('bfgs')
 
+        checkpoint.close()
+
         logger.debug("prediction started...")
         y_pred, var_pred, nlpd = m.predict(Xtest, Ytest)
         logger.debug("prediction finished")
@@ -472,6 +558,9 @@ class ModelLearn:
         properties['total_time'] = total_time
         properties['time_per_iter'] = timer_per_iter
         properties['total_evals'] = total_evals
+        if validation is not None:
+            properties['validation_best_iter'] = validation.best_iter
+            properties['validation_best_nlpd'] = validation.best_nlpd
         ModelLearn.export_configuration(folder_name, properties)
         return folder_name, m
 
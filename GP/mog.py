@@ -11,6 +11,8 @@ class MoG:
 
     q(u) = \sum_K \mult_Q N(u, m[k,j], s[k,j])
 
+    The parameters of the distribution are stored in a single flat array (``parameters``), and ``m``, the raw
+    parameters of the covariances and ``pi_untrans`` are views into it (see ``_init_parameters``).
     """
 
     def __init__(self, num_comp, num_process, num_dim):
@@ -27,13 +29,42 @@ class MoG:
         self.m = []
         self.pi = []
         self.parameters = []
+        self.version = 0
+        """ incremented every time the parameters of the distribution change (see ``_update``). Can be used to
+        memoize quantities which only depend on the posterior. """
+
+        self._jitter_memory = {}
+        """ jitters which were needed for decomposing the matrices of this distribution (see ``util.jitchol``) """
 
     def __str__(self):
         return 'm:' + str(self.m) + '\n' + 's:' + str(self.s) + '\n' + 'pi:' + str(self.pi)
 
+    def _init_parameters(self, buffer=None):
+        """
+        Binds ``m``, the raw parameters of the covariances (using ``m_from_array`` and ``s_from_array``) and
+        ``pi_untrans`` as views into ``buffer``, which is then used as ``parameters``. If ``buffer`` is None a new
+        array is allocated. It should be called by sub-classes before the parameters are initialized. Calling it again
+        with a new buffer (for example a part of a larger buffer owned by the model) copies the current parameters
+        into the new buffer.
+
+        Parameters
+        ----------
+        buffer : ndarray
+         an array of size self.get_m_size() + self.get_s_size() + self.num_comp
+        """
+
+        if buffer is None:
+            buffer = np.zeros(self.get_m_size() + self.get_s_size() + self.num_comp)
+        elif len(self.parameters):
+            buffer[:] = self.parameters
+        self.parameters = buffer
+        self.m_from_array(buffer[:self.get_m_size()])
+        self.s_from_array(buffer[self.get_m_size():(self.get_m_size() + self.get_s_size())])
+        self.pi_untrans = buffer[(self.get_m_size() + self.get_s_size()):]
+
     def update_parameters(self, params):
         """
-        Sets parameters of the posterior distribution.
+        Sets parameters of the posterior distribution by copying ``params`` into ``parameters``.
 
         Parameters
         ----------
@@ -42,10 +73,8 @@ class MoG:
          parameters
         """
 
-        self.parameters = params
-        self.m_from_array(params[:self.get_m_size()])
-        self.s_from_array(params[self.get_m_size():(self.get_m_size() + self.get_s_size())])
-        self.pi_from_array(params[(self.get_m_size() + self.get_s_size()):])
+        self.parameters[:] = params
+        self.pi_from_array(self.pi_untrans)
         self._update()
 
     def pi_dim(self):
@@ -65,7 +94,7 @@ class MoG:
         Initializes posterior distributions using fixed numbers
         :return: None
         """
-        self.m = np.random.uniform(low=0.0, high=0.0, size=(self.num_comp, self.num_process, self.num_dim))
+        self.m[:] = np.random.uniform(low=0.0, high=0.0, size=(self.num_comp, self.num_process, self.num_dim))
         self.pi_from_array(np.random.uniform(low=1.0, high=5.0, size=self.num_comp))
 
     def transform_S_grad(self, g):
@@ -86,7 +115,7 @@ class MoG:
         Initialised posterior parameters randomly
         :return:
         """
-        self.m = np.random.uniform(low=-15.1, high=15.1, size=(self.num_comp, self.num_process, self.num_dim))
+        self.m[:] = np.random.uniform(low=-15.1, high=15.1, size=(self.num_comp, self.num_process, self.num_dim))
         self.pi_from_array(np.random.uniform(low=1.0, high=10.0, size=self.num_comp))
 
     def random_init(self):
@@ -106,7 +135,7 @@ class MoG:
 
         pis = np.exp(p)
         self.pi = pis / sum(pis)
-        self.pi_untrans = p.copy()
+        self.pi_untrans[:] = p
 
     def dpi_dx(self):
         pit = np.repeat(np.array([self.pi.T]), self.num_comp, 0)
@@ -124,6 +153,55 @@ class MoG:
         """
         return mdot(p, self.dpi_dx())
 
+    def natural_gradient(self, g):
+        """
+        Transforms the gradient ``g`` wrt to the parameters of the distribution (in the same order as
+        ``self.parameters``) to the natural gradient, i.e., F^-1 g where F is the Fisher information matrix.
+
+        The Fisher matrix of a mixture is not tractable, and therefore each component is treated as an independent
+        Gaussian with a weight of pi[k], which gives a block diagonal Fisher matrix:
+
+         F(m[k,j]) = pi[k] s[k,j]^-1,  F(s[k,j]) = pi[k] / 2 tr(s[k,j]^-1 ds s[k,j]^-1 ds),
+
+        and the Fisher matrix of the categorical distribution for the weights of the components. The block
+        corresponding to the covariance is calculated by ``_natural_S_grad``.
+
+        Parameters
+        ----------
+        g : ndarray
+         gradient wrt to the parameters. Dimensions: ``self.num_parameters()``
+
+        Returns
+        -------
+        nat_g : ndarray
+         the natural gradient. Dimensions: ``self.num_parameters()``
+        """
+
+        m_size = self.get_m_size()
+        s_size = self.get_s_size()
+        pi = np.maximum(self.pi, 1e-10)
+        g_m = g[:m_size].reshape((self.num_comp, self.num_process, self.num_dim))
+        nat_m = np.empty(g_m.shape)
+        for k in range(self.num_comp):
+            for j in range(self.num_process):
+                nat_m[k, j] = self.Sa(g_m[k, j], k, j) / pi[k]
+        nat_s = self._natural_S_grad(g[m_size:(m_size + s_size)].reshape((self.num_comp, self.num_process, -1)))
+        nat_s /= pi[:, np.newaxis, np.newaxis]
+        # the Fisher matrix of the softmax, diag(pi) - pi pi^T, is singular, and its null space is the constant vector.
+        # Since the gradient wrt to the unconstrained parameters of pi sums to zero, the minimum-norm solution is
+        # g / pi projected onto the zero-sum subspace.
+        nat_pi = g[(m_size + s_size):] / pi
+        nat_pi -= nat_pi.mean()
+        return np.hstack([nat_m.flatten(), nat_s.flatten(), nat_pi])
+
+    def _natural_S_grad(self, g):
+        """
+        Given ``g``, the gradient wrt to the raw parameters of the covariance matrices (dimensions: K * Q * ``S_dim``),
+        returns the natural gradient assuming pi[k] = 1. Representations of the covariance for which the Fisher matrix
+        is not implemented use the Euclidean gradient.
+        """
+        return g.copy()
+
     def get_m_size(self):
         """
         :return: total size of the array containing mean of the posterior for all components and processes
@@ -165,8 +243,12 @@ class MoG:
         and M^2 in the case of full posterior covariance) """
         raise NotImplementedError
 
+    def get_parameters(self):
+        """ :returns: the flat array of parameters. Note that the array is not copied. """
+        return self.parameters
+
     def m_from_array(self, ma):
-        """ initializes the mean from ma"""
+        """ binds the mean as a view into ``ma`` """
         raise NotImplementedError
 
     def get_sjk_size(self):
@@ -174,8 +256,8 @@ class MoG:
         raise NotImplementedError
 
     def s_from_array(self, sa):
-        """ initializes the covariance matrix from ``sa``. Note that ``sa`` is in the raw space, ie., it is coming directly
-        form the optimiser"""
+        """ binds the raw parameters of the covariance matrices as views into ``sa``. Note that ``sa`` is in the raw
+        space, ie., it is coming directly form the optimiser"""
         raise NotImplementedError
 
     def log_pdf(self, j, k, l):
@@ -203,6 +285,13 @@ class MoG:
         """ :return  m_kj m_kj^T  + s_kj  """
         raise NotImplementedError
 
+    def sandwich_pi_S(self, A, j):
+        """
+        :return: A (sum_k pi[k] s[k,j]) A^T, where the sum over the components is formed before the products with A.
+        """
+        return mdot(A, sum(self.pi[k] * (self.mmTS(k, j) - np.outer(self.m[k, j], self.m[k, j]))
+                           for k in range(self.num_comp)), A.T)
+
     def dAinvS_dS(self, L, k, j):
         r"""
         Assuming ``L`` = chol (A), then this function calculates dA^{-1}s[k,j] \\ ds[k,j] and transforms the results to the
@@ -213,13 +302,29 @@ class MoG:
         """ :return  dA^{-1}S dS  """
         raise NotImplementedError
 
+    def tr_dAinvS_dS(self, L, j):
+        """
+        Calculates ``tr_AinvS`` and ``dAinvS_dS`` for all the components of latent process ``j`` at once. Subclasses
+        override this function to solve against ``L`` once for all the components.
+
+        Returns
+        -------
+        tr : ndarray
+         trace(A^-1 s[k,j]) for all k. Dimensions: K
+
+        d_tr : ndarray
+         d trace(A^-1 s[k,j]) \\ ds[k,j] in the raw space for all k. Dimensions: K * ``get_sjk_size()``
+        """
+        return np.array([self.tr_AinvS(L, k, j) for k in range(self.num_comp)]), \
+               np.array([self.dAinvS_dS(L, k, j) for k in range(self.num_comp)])
+
     def Sa(self, a, k, j):
         """ :return  S_kj a  """
         raise NotImplementedError
 
     def _update(self):
-        """ updates internal variables of the class """
-        pass
+        """ updates internal variables of the class, and should increment ``version`` """
+        self.version += 1
 
     def get_m_S_params(self):
         """
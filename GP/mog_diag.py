@@ -1,6 +1,6 @@
 __author__ = 'AT'
 
-from util import inv_chol
+from util import inv_chol_diag
 from GPy.util.linalg import mdot
 from mog import MoG
 import numpy as np
@@ -24,34 +24,28 @@ class MoG_Diag(MoG):
     def __init__(self, num_comp, num_process, num_dim):
         MoG.__init__(self, num_comp, num_process, num_dim)
         self.invC_klj_Sk = np.empty((self.num_comp, self.num_comp, self.num_process, self.num_dim))
-        self.s = []
+        self.s = np.empty((self.num_comp, self.num_process, self.num_dim))
+        self._init_parameters()
         self._fixed_init()
         self._update()
         self.num_free_params = self.parameters.shape[0]
 
-    def get_parameters(self):
-        return np.hstack([self.m.flatten(), self.log_s.flatten(), self.pi_untrans])
-
     def num_parameters(self):
         return self.num_free_params
 
     def _fixed_init(self):
         MoG._fixed_init(self)
-        self.s = np.random.uniform(low=0.5, high=0.5, size=(self.num_comp, self.num_process, self.num_dim))
-        self.log_s = np.log(self.s)
+        self.log_s[:] = np.log(np.random.uniform(low=0.5, high=0.5, size=(self.num_comp, self.num_process, self.num_dim)))
 
     def _random_init(self):
         MoG._random_init(self)
-        self.s = np.random.uniform(low=1.0, high=3.0, size=(self.num_comp, self.num_process, self.num_dim))
-        self.log_s = np.log(self.s)
+        self.log_s[:] = np.log(np.random.uniform(low=1.0, high=3.0, size=(self.num_comp, self.num_process, self.num_dim)))
 
     def update_covariance(self, j, Sj):
-        for k in range(self.num_comp):
-            self.s[k,j,:] = np.diagonal(Sj).copy()
-            if min(self.s[k,j,:]) < 0:
-                self.s[k,j,:] = self.s[k,j,:] - 2 * min(self.s[k,j,:])
-
-        self.log_s = np.log(self.s)
+        s = np.diagonal(Sj).copy()
+        if min(s) < 0:
+            s = s - 2 * min(s)
+        self.log_s[:, j] = np.log(s)
         self._update()
 
     def transform_S_grad(self, g):
@@ -66,6 +60,12 @@ class MoG_Diag(MoG):
         """
         return g.flatten() * self.s.flatten()
 
+    def _natural_S_grad(self, g):
+        """
+        In the log(s) space the Fisher matrix of a diagonal Gaussian is I / 2.
+        """
+        return 2. * g
+
     def get_s_size(self):
         return self.num_comp * self.num_process * self.num_dim
 
@@ -79,11 +79,10 @@ class MoG_Diag(MoG):
         self.m = ma.reshape((self.num_comp, self.num_process, self.num_dim))
 
     def s_from_array(self, sa):
-        self.s = np.exp(sa).reshape((self.num_comp, self.num_process, self.num_dim))
         self.log_s = sa.reshape((self.num_comp, self.num_process, self.num_dim))
 
     def tr_AinvS(self, L, k, j):
-        return np.dot(np.diagonal(inv_chol(L)), self.s[k,j,:])
+        return np.dot(inv_chol_diag(L), self.s[k,j,:])
 
     def tr_AS(self, A, k, j):
         return np.dot(np.diagonal(A), self.s[k,j,:])
@@ -106,35 +105,42 @@ class MoG_Diag(MoG):
                 np.square(self.invC_klj_Sk[k, l, j] * (self.m[k, j, :] - self.m[l, j, :])) / self.s[k,j])
 
     def aSa(self, a, k, j):
-        # return mdot(self.s[k, j, :], (a ** 2))
-        return np.diagonal(mdot(a, np.diag(self.s[k,j,:]), a.T))
+        return np.dot(np.square(a), self.s[k,j,:])
 
     def mmTS(self, k, j):
         return mdot(self.m[k,j, np.newaxis].T, self.m[k,j, np.newaxis]) + np.diag(self.s[k,j])
 
     def dAinvS_dS(self, L, k, j):
-        return np.diagonal(inv_chol(L)) * self.s[k,j,:].flatten()
+        return inv_chol_diag(L) * self.s[k,j,:].flatten()
 
     def dAS_dS(self, S, k, j):
         return np.diagonal(S) * self.s[k,j,:].flatten()
 
     def Sa(self, a, k, j):
-        return mdot(np.diag(self.s[k,j]), a)
+        return (a.T * self.s[k,j]).T
+
+    def sandwich_pi_S(self, A, j):
+        return mdot(A * np.dot(self.pi, self.s[:, j]), A.T)
+
+    def tr_dAinvS_dS(self, L, j):
+        inv_diag = inv_chol_diag(L)
+        return np.dot(self.s[:, j], inv_diag), self.s[:, j] * inv_diag
 
     def _update(self):
-        self.parameters = self.get_parameters()
-        for k in range(self.num_comp):
-            for l in range(self.num_comp):
-                for j in range(self.num_process):
-                    self.invC_klj_Sk[k,l,j] = self._s_k_skl(k,l,j)
+        self.version += 1
+        np.exp(self.log_s, out=self.s)
+        self.invC_klj_Sk = self._s_k_skl(self.log_s[:, np.newaxis], self.log_s[np.newaxis, :])
 
-    def _s_k_skl(self, k, l, j):
+    @staticmethod
+    def _s_k_skl(log_s_k, log_s_l):
         """
-        calculates s[k,j] / (s[k,j] + s[k,l]) in a hopefully numerical stable manner.
+        calculates s[k] / (s[k] + s[l]) in a hopefully numerical stable manner. Inputs are broadcast against each
+        other, and therefore passing log_s[:, np.newaxis] and log_s[np.newaxis, :] gives the ratio for all pairs of
+        components in an array of shape K * K * Q * M.
         """
 
-        a = np.maximum(self.log_s[k, j, :], self.log_s[l, j, :])
-        return np.exp((-a + self.log_s[k, j, :])) / (np.exp((-a + self.log_s[l, j, :]))  + np.exp((-a + self.log_s[k, j, :])))
+        a = np.maximum(log_s_k, log_s_l)
+        return np.exp((-a + log_s_k)) / (np.exp((-a + log_s_l)) + np.exp((-a + log_s_k)))
 
     def get_m_S_params(self):
         return self.m, self.log_s
@@ -0,0 +1,81 @@
+__author__ = 'AT'
+
+import math
+from scipy.linalg import cho_solve
+from mog import MoG
+from mog_single_comp import MoG_SingleComponent
+from util import jitchol, pddet
+import numpy as np
+
+
+class MoG_Full(MoG_SingleComponent):
+    """
+    Implementation of posterior distribution when it is a mixture of Gaussians with full covariance matrices. Each
+    covariance matrix is represented by its Cholesky decomposition in the same way as in ``MoG_SingleComponent``.
+
+    The entropy term needs N(m[k,j] | m[l,j], s[k,j] + s[l,j]) for all pairs of components. The Cholesky
+    decompositions of s[k,j] + s[l,j] are cached, and are only recalculated for the pairs in which the covariance of
+    one of the components has changed.
+
+    Attributes
+    ----------
+    C_chol : ndarray
+     C_chol[k, l, j] is the Cholesky decomposition of s[k,j] + s[l,j]. Dimensions: K * K * Q * M * M
+
+    C_alpha : ndarray
+     C_alpha[k, l, j] = (s[k,j] + s[l,j]) ^ -1 (m[k,j] - m[l,j]). Dimensions: K * K * Q * M
+    """
+
+    def __init__(self, num_comp, num_process, num_dim):
+        MoG.__init__(self, num_comp, num_process, num_dim)
+        self.C_chol = np.zeros((num_comp, num_comp, num_process, num_dim, num_dim))
+        self.C_alpha = np.empty((num_comp, num_comp, num_process, num_dim))
+        self.C_log_det = np.empty((num_comp, num_comp, num_process))
+        self._cached_m = None
+        self._cached_L = None
+        self._init_buffers()
+
+    def log_pdf(self, j, k, l):
+        """ :return log N_j(m_k|m_l, S_l + S_k)"""
+        return -float(self.num_dim) / 2 * math.log(2 * math.pi) - 0.5 * self.C_log_det[k, l, j] - \
+               0.5 * np.dot(self.m[k, j] - self.m[l, j], self.C_alpha[k, l, j])
+
+    def C_m(self, j, k, l):
+        """
+        Returns (s[k,j] + s[l,j]) ^ -1 (m[k,j] - m[l,j])
+        """
+        return self.C_alpha[k, l, j]
+
+    def C_m_C(self, j, k, l):
+        """
+        Returns C ^ -1 - C ^ -1 (m[k,j] - m[l,j]) (m[k,j] - m[l,j]) ^ T C ^ -1, where C = s[k,j] + s[l,j].
+
+        Unlike ``MoG_Diag.C_m_C`` the output is in the space of the covariance matrix, and it should be transformed to
+        the raw space using ``transform_S_grad``.
+        """
+        return cho_solve((self.C_chol[k, l, j], True), np.eye(self.num_dim)) - \
+               np.outer(self.C_alpha[k, l, j], self.C_alpha[k, l, j])
+
+    def _update(self):
+        MoG_SingleComponent._update(self)
+        if self._cached_m is None:
+            s_changed = np.ones(self.num_comp, dtype=bool)
+            m_changed = s_changed
+        else:
+            s_changed = (self.L_flatten != self._cached_L).reshape(self.num_comp, -1).any(axis=1)
+            m_changed = s_changed | (self.m != self._cached_m).reshape(self.num_comp, -1).any(axis=1)
+        for k in range(self.num_comp):
+            for l in range(k, self.num_comp):
+                if not (m_changed[k] or m_changed[l]):
+                    continue
+                for j in range(self.num_process):
+                    if s_changed[k] or s_changed[l]:
+                        self.C_chol[k, l, j] = jitchol(self.s[k, j] + self.s[l, j], memory=self._jitter_memory,
+                                                        key=('C', k, l, j))
+                        self.C_chol[l, k, j] = self.C_chol[k, l, j]
+                        self.C_log_det[k, l, j] = pddet(self.C_chol[k, l, j])
+                        self.C_log_det[l, k, j] = self.C_log_det[k, l, j]
+                    self.C_alpha[k, l, j] = cho_solve((self.C_chol[k, l, j], True), self.m[k, j] - self.m[l, j])
+                    self.C_alpha[l, k, j] = -self.C_alpha[k, l, j]
+        self._cached_m = np.array(self.m)
+        self._cached_L = self.L_flatten.copy()
@@ -0,0 +1,212 @@
+__author__ = 'AT'
+
+import math
+from GPy.util.linalg import mdot
+from scipy.linalg import cho_solve, solve_triangular
+from mog import MoG
+from util import inv_chol_diag, jitchol, pddet
+import numpy as np
+
+
+class MoG_LowRank(MoG):
+    """
+    Implementation of posterior distribution when it is a mixture of Gaussians, and the covariance matrix of each
+    component is the sum of a diagonal and a low-rank matrix:
+
+     s[k,j] = diag(d[k,j]) + V[k,j] V[k,j]^T,  where V[k,j] is a M * r matrix.
+
+    The parameters of each covariance matrix are log(d[k,j]) and V[k,j], and therefore the number of parameters, and
+    the cost of the operations on s[k,j], is O(M * r). Inverses and determinants of the sum of two covariance matrices,
+    which are needed for the entropy term, are calculated using the Woodbury identity and the matrix determinant
+    lemma.
+
+    Gradients wrt to the covariance matrices (for example ``C_m_C`` and ``dAinvS_dS``) are returned in the raw space,
+    i.e., wrt to [log(d[k,j]), V[k,j]], in the same way as ``MoG_Diag``.
+
+    Attributes
+    ----------
+    log_d : ndarray
+     logarithm of the diagonal part of the covariance matrices. Dimensions: K * Q * M
+
+    V : ndarray
+     low-rank part of the covariance matrices. Dimensions: K * Q * M * r
+
+    C_W, C_LB, C_alpha, C_log_det : ndarray
+     for each pair of components (k, l), assuming C = s[k,j] + s[l,j] = D + U U^T where U = [V[k,j], V[l,j]]:
+     C_W[k,l,j] = D^-1 U, C_LB[k,l,j] = chol(I + U^T D^-1 U), C_alpha[k,l,j] = C^-1 (m[k,j] - m[l,j]) and
+     C_log_det[k,l,j] = log |C|
+    """
+
+    def __init__(self, num_comp, num_process, num_dim, rank):
+        MoG.__init__(self, num_comp, num_process, num_dim)
+        self.rank = rank
+        self._init_parameters()
+        self.C_W = np.empty((self.num_comp, self.num_comp, self.num_process, self.num_dim, 2 * self.rank))
+        self.C_LB = np.empty((self.num_comp, self.num_comp, self.num_process, 2 * self.rank, 2 * self.rank))
+        self.C_alpha = np.empty((self.num_comp, self.num_comp, self.num_process, self.num_dim))
+        self.C_log_det = np.empty((self.num_comp, self.num_comp, self.num_process))
+        self._fixed_init()
+        self._update()
+        self.num_free_params = self.parameters.shape[0]
+
+    def __str__(self):
+        return 'm:' + str(self.m) + '\n' + 'd:' + str(self.d) + '\n' + 'V:' + str(self.V) + '\n' + 'pi:' + str(self.pi)
+
+    def _S_params(self):
+        """
+        :returns: raw parameters of the covariance matrices, i.e., [log(d[k,j]), V[k,j]]. Dimensions: K * Q * (M + M * r)
+        """
+        return self.parameters[self.get_m_size():(self.get_m_size() + self.get_s_size())].\
+            reshape((self.num_comp, self.num_process, self.get_sjk_size()))
+
+    def num_parameters(self):
+        return self.num_free_params
+
+    def _fixed_init(self):
+        MoG._fixed_init(self)
+        self.log_d[:] = np.log(np.random.uniform(low=0.5, high=0.5, size=(self.num_comp, self.num_process, self.num_dim)))
+        self.V[:] = np.tile(np.eye(self.num_dim, self.rank) * 0.1, (self.num_comp, self.num_process, 1, 1))
+
+    def _random_init(self):
+        MoG._random_init(self)
+        self.log_d[:] = np.log(np.random.uniform(low=1.0, high=3.0, size=(self.num_comp, self.num_process, self.num_dim)))
+        self.V[:] = np.random.uniform(low=-1.0, high=1.0, size=(self.num_comp, self.num_process, self.num_dim, self.rank))
+
+    def update_covariance(self, j, Sj):
+        """
+        Approximates ``Sj`` by diag(d) + V V^T, where V is built from the ``rank`` leading eigenvectors of ``Sj``, and
+        d is chosen so that the diagonal of ``Sj`` is preserved where possible.
+        """
+        eig_vals, eig_vecs = np.linalg.eigh(Sj)
+        top = np.argsort(eig_vals)[::-1][:self.rank]
+        V = eig_vecs[:, top] * np.sqrt(np.maximum(eig_vals[top], 0) / 2)
+        d = np.diagonal(Sj) - np.square(V).sum(axis=1)
+        d[d <= 0] = np.absolute(np.diagonal(Sj)).mean() * 1e-3
+        for k in range(self.num_comp):
+            self.log_d[k, j] = np.log(d)
+            self.V[k, j] = V
+        self._update()
+
+    def transform_S_grad(self, g):
+        r"""
+        Gradients wrt to the covariance are calculated directly in the raw space (see ``dAinvS_dS``, ``C_m_C`` and
+        ``SAVIGP_LowRank._dell_ds``), and therefore this function only flattens ``g``.
+        """
+        return g.flatten()
+
+    def get_s_size(self):
+        return self.num_comp * self.num_process * self.get_sjk_size()
+
+    def get_sjk_size(self):
+        return self.num_dim + self.num_dim * self.rank
+
+    def S_dim(self):
+        return self.get_sjk_size(),
+
+    def m_from_array(self, ma):
+        self.m = ma.reshape((self.num_comp, self.num_process, self.num_dim))
+
+    def s_from_array(self, sa):
+        sa = sa.reshape((self.num_comp, self.num_process, self.get_sjk_size()))
+        self.log_d = sa[:, :, :self.num_dim]
+        self.V = sa[:, :, self.num_dim:].reshape((self.num_comp, self.num_process, self.num_dim, self.rank))
+
+    def get_m_S_params(self):
+        return self.m, self._S_params()
+
+    def raw_S_grad(self, G_diag, GV, k, j):
+        """
+        Given the diagonal of G = df \\ ds[k,j] (``G_diag``) and G V[k,j] (``GV``), returns the gradient of f wrt to
+        [log(d[k,j]), V[k,j]].
+        """
+        return np.hstack((G_diag * self.d[k, j], 2. * GV.flatten()))
+
+    def tr_AinvS(self, L, k, j):
+        return np.dot(inv_chol_diag(L), self.d[k, j]) + np.square(solve_triangular(L, self.V[k, j], lower=True)).sum()
+
+    def tr_AS(self, A, k, j):
+        return np.dot(np.diagonal(A), self.d[k, j]) + (self.V[k, j] * mdot(A, self.V[k, j])).sum()
+
+    def dAinvS_dS(self, L, k, j):
+        return self.raw_S_grad(inv_chol_diag(L), cho_solve((L, True), self.V[k, j]), k, j)
+
+    def dAS_dS(self, S, k, j):
+        return self.raw_S_grad(np.diagonal(S), mdot(S, self.V[k, j]), k, j)
+
+    def sandwich_pi_S(self, A, j):
+        """
+        Uses the diagonal plus low-rank structure, i.e., sum_k pi[k] s[k,j] = diag(sum_k pi[k] d[k,j]) + U U^T, where
+        U = [sqrt(pi[0]) V[0,j], ..., sqrt(pi[K]) V[K,j]].
+        """
+        AU = mdot(A, np.hstack(self.V[:, j] * np.sqrt(self.pi)[:, np.newaxis, np.newaxis]))
+        return mdot(A * np.dot(self.pi, self.d[:, j]), A.T) + mdot(AU, AU.T)
+
+    def tr_dAinvS_dS(self, L, j):
+        """
+        Solves against ``L`` once for [I, V[0,j], ..., V[K,j]], from which both diag(A^-1) and A^-1 V[k,j] follow.
+        """
+        n, K, r = self.num_dim, self.num_comp, self.rank
+        W = solve_triangular(L, np.hstack([np.eye(n)] + list(self.V[:, j])), lower=True)
+        inv_diag = np.square(W[:, :n]).sum(axis=0)
+        W = W[:, n:]
+        tr = np.dot(self.d[:, j], inv_diag) + np.square(W).reshape(n, K, r).sum(axis=(0, 2))
+        GV = solve_triangular(L, W, lower=True, trans=1).reshape(n, K, r).swapaxes(0, 1)
+        return tr, np.array([self.raw_S_grad(inv_diag, GV[k], k, j) for k in range(K)])
+
+    def aSa(self, a, k, j):
+        return np.dot(np.square(a), self.d[k, j]) + np.square(mdot(a, self.V[k, j])).sum(axis=1)
+
+    def Sa(self, a, k, j):
+        return (a.T * self.d[k, j]).T + mdot(self.V[k, j], mdot(self.V[k, j].T, a))
+
+    def mmTS(self, k, j):
+        return np.outer(self.m[k, j], self.m[k, j]) + np.diag(self.d[k, j]) + mdot(self.V[k, j], self.V[k, j].T)
+
+    def log_pdf(self, j, k, l):
+        """ :return log N_j(m_k|m_l, S_l + S_k)"""
+        return -float(self.num_dim) / 2 * math.log(2 * math.pi) - 0.5 * self.C_log_det[k, l, j] - \
+               0.5 * np.dot(self.m[k, j] - self.m[l, j], self.C_alpha[k, l, j])
+
+    def C_m(self, j, k, l):
+        """
+        Returns (s[k,j] + s[l,j]) ^ -1 (m[k,j] - m[l,j])
+        """
+        return self.C_alpha[k, l, j]
+
+    def _C_inv_mult(self, k, l, j, x):
+        """
+        Returns (s[k,j] + s[l,j]) ^ -1 x using the Woodbury identity.
+        """
+        W = self.C_W[k, l, j]
+        return (x.T / (self.d[k, j] + self.d[l, j])).T - mdot(W, cho_solve((self.C_LB[k, l, j], True), mdot(W.T, x)))
+
+    def C_m_C(self, j, k, l):
+        """
+        Returns gradient of log N(m[k,j] | m[l,j], C) wrt to C, multiplied by -2, i.e., C^-1 - C^-1 (m[k,j] - m[l,j])
+        (m[k,j] - m[l,j]) ^ T C^-1, where C = s[k,j] + s[l,j]. The output is transformed to the raw space of the
+        parameters of s[k,j].
+        """
+        alpha = self.C_alpha[k, l, j]
+        R = solve_triangular(self.C_LB[k, l, j], self.C_W[k, l, j].T, lower=True)
+        C_inv_diag = 1. / (self.d[k, j] + self.d[l, j]) - np.square(R).sum(axis=0)
+        GV = self._C_inv_mult(k, l, j, self.V[k, j]) - np.outer(alpha, mdot(alpha, self.V[k, j]))
+        return self.raw_S_grad(C_inv_diag - np.square(alpha), GV, k, j)
+
+    def _update(self):
+        self.version += 1
+        self.d = np.exp(self.log_d)
+        eye = np.eye(2 * self.rank)
+        for k in range(self.num_comp):
+            for l in range(k, self.num_comp):
+                for j in range(self.num_process):
+                    D = self.d[k, j] + self.d[l, j]
+                    U = np.hstack((self.V[k, j], self.V[l, j]))
+                    W = (U.T / D).T
+                    LB = jitchol(eye + mdot(U.T, W), memory=self._jitter_memory, key=('LB', k, l, j))
+                    delta = self.m[k, j] - self.m[l, j]
+                    alpha = delta / D - mdot(W, cho_solve((LB, True), mdot(W.T, delta)))
+                    self.C_W[k, l, j] = self.C_W[l, k, j] = W
+                    self.C_LB[k, l, j] = self.C_LB[l, k, j] = LB
+                    self.C_log_det[k, l, j] = self.C_log_det[l, k, j] = np.log(D).sum() + pddet(LB)
+                    self.C_alpha[k, l, j] = alpha
+                    self.C_alpha[l, k, j] = -alpha
@@ -17,16 +17,32 @@ class MoG_SingleComponent(MoG):
     ----------
     L : ndarray
      Cholesky decomposition of the covariance matrix
+
+    tril_indices, diag_indices : tuple
+     indices of the lower-triangular and diagonal elements of a num_dim * num_dim matrix
+
+    flatten_diag : ndarray
+     positions of the diagonal elements of L in L_flatten
     """
 
     def __init__(self, num_process, num_dim):
         MoG.__init__(self, 1, num_process, num_dim)
+        self._init_buffers()
+
+    def _init_buffers(self):
+        """
+        Allocates internal arrays and initializes the distribution. It is called by ``__init__`` after ``num_comp``,
+        ``num_process`` and ``num_dim`` are set.
+        """
+        num_dim = self.num_dim
+        self.tril_indices = np.tril_indices(num_dim)
+        self.diag_indices = np.diag_indices(num_dim)
+        self.flatten_diag = np.where(self.tril_indices[0] == self.tril_indices[1])[0]
         self.invC_klj = np.empty((self.num_comp, self.num_comp, self.num_process, self.num_dim, self.num_dim))
-        self.m = []
         self.pi = []
-        self.L_flatten = np.empty((self.num_comp, self.num_process, self.get_sjk_size()))
+        self._init_parameters()
         self.s = np.empty((self.num_comp, self.num_process, self.num_dim, self.num_dim))
-        self.L = np.empty((self.num_comp, self.num_process, self.num_dim, self.num_dim))
+        self.L = np.zeros((self.num_comp, self.num_process, self.num_dim, self.num_dim))
         self.log_det = np.empty((self.num_comp, self.num_comp, self.num_process))
         self._fixed_init()
         self._update()
@@ -37,7 +53,7 @@ class MoG_SingleComponent(MoG):
                0.5 * pddet(self.L[0,j,:])
 
     def aSa(self, a, k, j):
-        return np.diagonal(mdot(a, self.s[k,j,:,:], a.T))
+        return np.square(mdot(a, self.L[k,j,:,:])).sum(axis=1)
 
     def mmTS(self, k, j):
         return mdot(self.m[k,j,:,np.newaxis], self.m[k,j,:,np.newaxis].T) + self.s[k,j]
@@ -51,27 +67,20 @@ class MoG_SingleComponent(MoG):
         entropy term wrt to the posterior covariance is identity. This function returns flatten lower-triangular terms
         of the identity matrices for all processes.
         """
-        grad = np.empty((self.num_comp, self.num_process, self.get_sjk_size()))
-        meye = np.eye((self.num_dim))[np.tril_indices_from(self.L[0,0])]
-        for k in range(self.num_comp):
-            for j in range(self.num_process):
-                grad[k,j] = meye
-        return grad.flatten()
-
-    def get_parameters(self):
-        return np.hstack([self.m.flatten(), self.L_flatten.flatten(), self.pi_untrans])
+        meye = np.eye((self.num_dim))[self.tril_indices]
+        return np.tile(meye, self.num_comp * self.num_process)
 
     def update_covariance(self, j, Sj):
         Sj = Sj.copy()
-        mm = min(Sj[np.diag_indices_from(Sj)])
+        mm = min(Sj[self.diag_indices])
         if mm < 0:
-            Sj[np.diag_indices_from(Sj)] = Sj[np.diag_indices_from(Sj)] - 1.1 * mm
+            Sj[self.diag_indices] = Sj[self.diag_indices] - 1.1 * mm
         for k in range(self.num_comp):
             self.s[k,j] = Sj.copy()
-            self.L[k,j] = jitchol(Sj,10)
+            self.L[k,j] = jitchol(Sj, 10, memory=self._jitter_memory, key=('S', j))
             tmp = self.L[k,j].copy()
-            tmp[np.diag_indices_from(tmp)] = np.log(tmp[np.diag_indices_from(tmp)])
-            self.L_flatten[k,j] = tmp[np.tril_indices_from(tmp)]
+            tmp[self.diag_indices] = np.log(tmp[self.diag_indices])
+            self.L_flatten[k,j] = tmp[self.tril_indices]
         self._update()
 
     def num_parameters(self):
@@ -120,13 +129,28 @@ class MoG_SingleComponent(MoG):
 
     def dAinvS_dS(self, L, k, j):
         tmp = 2 * cho_solve((L, True), self.L[k,j])
-        tmp[np.diag_indices_from(tmp)] *= self.L[k,j][np.diag_indices_from(tmp)]
-        return tmp[np.tril_indices_from(self.L[k,j])]
+        tmp[self.diag_indices] *= self.L[k,j][self.diag_indices]
+        return tmp[self.tril_indices]
+
+    def sandwich_pi_S(self, A, j):
+        return mdot(A, np.tensordot(self.pi, self.s[:, j], 1), A.T)
+
+    def tr_dAinvS_dS(self, L, j):
+        """
+        Solves against ``L`` once for the Cholesky factors of all the components, i.e., W = L^-1 [L[0,j], ..., L[K,j]],
+        and then trace(A^-1 s[k,j]) = |W[k]|^2 and A^-1 L[k,j] = L^-T W[k].
+        """
+        n, K = self.num_dim, self.num_comp
+        W = solve_triangular(L, np.hstack(self.L[:, j]), lower=True)
+        tr = np.square(W).reshape(n, K, n).sum(axis=(0, 2))
+        tmp = 2 * solve_triangular(L, W, lower=True, trans=1).reshape(n, K, n).swapaxes(0, 1)
+        tmp[:, self.diag_indices[0], self.diag_indices[1]] *= self.L[:, j, self.diag_indices[0], self.diag_indices[1]]
+        return tr, tmp[:, self.tril_indices[0], self.tril_indices[1]]
 
     def dAS_dS(self, S, k, j):
         tmp = 2 * mdot(S, self.L[k,j])
-        tmp[np.diag_indices_from(tmp)] *= self.L[k,j][np.diag_indices_from(tmp)]
-        return tmp[np.tril_indices_from(self.L[k,j])]
+        tmp[self.diag_indices] *= self.L[k,j][self.diag_indices]
+        return tmp[self.tril_indices]
 
     def transform_S_grad(self, g):
         r"""
@@ -138,21 +162,51 @@ class MoG_SingleComponent(MoG):
         :returns df \\ dL, where L is the Cholesky decomposition of S
         """
 
-        grad = np.empty((self.num_comp, self.num_process, self.get_sjk_size()))
+        grad = np.empty((self.num_comp, self.num_process, self.num_dim, self.num_dim))
         for k in range(self.num_comp):
             for j in range(self.num_process):
-                tmp = chol_grad(self.L[k,j], g[k,j])
-                tmp[np.diag_indices_from(tmp)] *= self.L[k,j][ np.diag_indices_from(tmp)]
-                grad[k,j] = tmp[np.tril_indices_from(self.L[k,j])]
+                grad[k,j] = chol_grad(self.L[k,j], g[k,j])
+        grad = grad[:, :, self.tril_indices[0], self.tril_indices[1]]
+        grad[:, :, self.flatten_diag] *= self.L_diag()
         return grad.flatten()
 
-    def _update(self):
-        self.parameters = self.get_parameters()
+    def _natural_S_grad(self, g):
+        r"""
+        The Fisher matrix is calculated in the local coordinates X, where L = L0 (I + X) and X is lower-triangular. In
+        these coordinates ds = L0 (X + X^T) L0^T, and therefore:
+
+         1/2 tr(s^-1 ds s^-1 ds) = 1/2 ||X + X^T||^2,
+
+        i.e., the Fisher matrix is diagonal, with 2 for the diagonal and 1 for the off-diagonal elements of X. The
+        gradient is transformed to X, divided by the Fisher matrix, and the result is transformed back to the raw space
+        (where the diagonal of L is in the log space).
+        """
+        nat_g = np.empty(g.shape)
+        L_diag = self.L_diag()
         for k in range(self.num_comp):
             for j in range(self.num_process):
-                temp = np.zeros((self.num_dim, self.num_dim))
-                temp[np.tril_indices_from(temp)] = self.L_flatten[k,j,:].copy()
-                temp[np.diag_indices_from(temp)] = np.exp(temp[np.diag_indices_from(temp)])
-                # temp[np.diag_indices_from(temp)] = temp[np.diag_indices_from(temp)] ** 2
-                self.L[k,j,:,:] = temp
-                self.s[k,j] = mdot(self.L[k,j,:,:], self.L[k,j,:,:].T)
+                g_L = np.zeros((self.num_dim, self.num_dim))
+                g_L[self.tril_indices] = g[k, j]
+                g_L[self.diag_indices] /= L_diag[k, j]
+                g_X = np.tril(mdot(self.L[k, j].T, g_L))
+                g_X[self.diag_indices] /= 2.
+                d_L = mdot(self.L[k, j], g_X)
+                d_L[self.diag_indices] /= L_diag[k, j]
+                nat_g[k, j] = d_L[self.tril_indices]
+        return nat_g
+
+    def L_diag(self):
+        """
+        :returns: diagonal elements of the Cholesky decompositions, in an array of shape K * Q * M
+        """
+        return self.L[:, :, self.diag_indices[0], self.diag_indices[1]]
+
+    def _update(self):
+        """
+        Unpacks ``L_flatten`` into the lower-triangular matrices ``L`` and calculates s = L L^T for all components and
+        processes at once, writing into the existing ``L`` and ``s`` buffers.
+        """
+        self.version += 1
+        self.L[:, :, self.tril_indices[0], self.tril_indices[1]] = self.L_flatten
+        self.L[:, :, self.diag_indices[0], self.diag_indices[1]] = np.exp(self.L_flatten[:, :, self.flatten_diag])
+        np.matmul(self.L, self.L.swapaxes(2, 3), out=self.s)
@@ -1,55 +1,176 @@
 __author__ = 'AT'
 
 import math
+import multiprocessing
 from scipy.optimize import fmin_l_bfgs_b, minimize, fmin_cg
 import numpy as np
 import time
 from util import JitChol
 from savigp import Configuration
+from likelihood import LogisticLL, SoftmaxLL
 
 
 class Optimizer:
     def __init__(self):
         pass
 
+    phase_names = {Configuration.MoG: 'mog', Configuration.HYPER: 'hyp', Configuration.LL: 'll',
+                   Configuration.INDUCING: 'inducing'}
+    """ names used for the groups of parameters, for example in per-group learning rates """
+
+    first_order_methods = ['sgd', 'adam', 'adagrad']
+    """ optimisers implemented by ``SGD`` """
+
     @staticmethod
-    def SGD(model, alpha, start, max_iter, ftol=0.0001, xtol=0.0001, verbose=True,
-            factor=1.0, opt_indices=None, adaptive_alpha=True, show_alpha= False):
-        if opt_indices is None:
-            opt_indices = range(0, len(start))
-        f, f_grad, update = Optimizer.get_f_f_grad_from_model(model, start, opt_indices, verbose=verbose)
-        iter = 0
-        x = start
-        last_f = float('Inf')
-        delta_LR = 0.1
-        avg_ftol = 100.
-        while iter < max_iter:
-            update(x)
-            new_f = f()
-            grad = f_grad()
-
-            if adaptive_alpha and alpha > 1. / max(abs(grad)) / 10:
-                alpha = 1. / max(abs(grad)) / 100
-            if adaptive_alpha and new_f < last_f and alpha < 1. / max(abs(grad)) / 1000:
-                alpha = min(1. / max(abs(grad)) / 500, 0.001)
-            if show_alpha:
-                print 'alpha', alpha,
-            x -= grad * alpha
-            if avg_ftol < ftol:
-                return x, new_f
-            if iter > 1 and new_f < last_f:
-                avg_ftol = (1 - delta_LR) * avg_ftol + delta_LR * math.fabs(last_f - new_f)
-            last_f = new_f
-            iter += 1
+    def SGD(model, logger, max_fun=None, method='adam', learning_rate=0.01, schedule=None, clip=None,
+            momentum=0.9, beta1=0.9, beta2=0.999, eps=1e-8, xtol=1e-8, apply_bound=False):
+        """
+        Optimises the ``model`` using a first-order stochastic optimiser, which only uses the gradients of the objective
+        function and is therefore suitable for noisy gradients (e.g., when ell is estimated using samples, or on
+        mini-batches of data). The available optimisers are:
+
+         'sgd': gradient descent with momentum, i.e., v = momentum * v + g, x = x - rate * v
+         'adam': Adam, i.e., steps are scaled by the running averages of the first and second moments of the gradients
+         'adagrad': AdaGrad, i.e., steps are scaled by the square root of the sum of the squared gradients
+
+        A step which fails (e.g., the Cholesky decomposition fails) is rejected and the learning rate is halved.
+
+        Parameters
+        ----------
+        model : model
+         the model to optimise
+
+        logger : logger
+         logger used for logging
+
+        max_fun : int (optional)
+         maximum number of function evaluations
+
+        method : string
+         the optimiser, one of 'sgd', 'adam' or 'adagrad'
+
+        learning_rate : float or dictionary
+         the learning rate. It can be a dictionary containing the learning rate for each group of parameters, e.g.,
+         {'mog': 0.05, 'hyp': 0.01}. Groups which are not in the dictionary use the learning rate 0.01.
+
+        schedule : string or callable (optional)
+         multiplier of the learning rate at step t (starting from 1). It can be 'constant', 'inv_sqrt' (1 / sqrt(t)),
+         'inv' (1 / t), or a function which receives t and returns the multiplier.
+
+        clip : float (optional)
+         maximum norm of the gradient. Gradients with larger norms are scaled down to have norm ``clip``.
+
+        momentum : float (optional)
+         momentum used by 'sgd'
+
+        beta1, beta2 : float (optional)
+         decay rates of the first and second moments used by 'adam'
+
+        eps : float (optional)
+         constant added to the denominator of the steps in 'adam' and 'adagrad'
+
+        xtol : float (optional)
+         the optimisation stops when the largest change in the parameters is less than ``xtol``
+
+        apply_bound : boolean or ndarray (optional)
+         whether to apply bounds. If True, parameters will be limited to be less than log (1e10). If it is a boolean
+         array, the bound is only applied to the parameters for which it is True.
+        """
+        if method not in Optimizer.first_order_methods:
+            raise ValueError('unknown first-order optimiser: ' + str(method))
+        start = model.get_params()
+        rates = np.empty(start.shape[0])
+        for group, sl, _ in model._config_slices():
+            if group is None:
+                continue
+            if isinstance(learning_rate, dict):
+                rates[sl] = learning_rate.get(Optimizer.phase_names[group], 0.01)
+            else:
+                rates[sl] = learning_rate
+
+        bounded = Optimizer._bound_mask(apply_bound, start.shape[0])
+        tracker = []
+        f, f_grad, update, best_x, total_evals = Optimizer.get_f_f_grad_from_model(model, start, range(0, len(start)),
+                                                                                   tracker, logger)
+        x = start.copy()
+        m1 = np.zeros(x.shape[0])
+        m2 = np.zeros(x.shape[0])
+        scale = 1.
+        t = 0
+        f()
+        while (max_fun is None or total_evals() < max_fun) and scale > 1e-10:
+            g = f_grad()
+            if clip is not None:
+                norm = np.sqrt(np.dot(g, g))
+                if norm > clip:
+                    g = g * (clip / norm)
+            t += 1
+            rate = rates * (scale * Optimizer._schedule_multiplier(schedule, t))
+            if method == 'sgd':
+                m1 = momentum * m1 + g
+                step = rate * m1
+            elif method == 'adam':
+                m1 = beta1 * m1 + (1. - beta1) * g
+                m2 = beta2 * m2 + (1. - beta2) * np.square(g)
+                step = rate * (m1 / (1. - beta1 ** t)) / (np.sqrt(m2 / (1. - beta2 ** t)) + eps)
+            else:
+                m2 += np.square(g)
+                step = rate * g / (np.sqrt(m2) + eps)
+            new_x = x - step
+            if bounded is not None:
+                new_x[bounded] = np.minimum(new_x[bounded], math.log(1e+10))
+            try:
+                f(new_x)
+            except OptTermination:
+                logger.debug('step rejected, learning rate multiplier: ' + str(scale / 2))
+                update(x)
+                scale /= 2
+                continue
+            converged = np.absolute(new_x - x).max() < xtol
+            x = new_x
+            if converged:
+                break
+        update(best_x())
         d = {}
-        d['funcalls'] = iter
-        return d
+        d['funcalls'] = total_evals()
+        return d, tracker
+
+    @staticmethod
+    def _bound_mask(apply_bound, num_params):
+        """
+        :returns: a boolean array indicating the parameters which are bounded, or None if no parameter is bounded
+        (see ``apply_bound`` in ``BFGS``)
+        """
+        if isinstance(apply_bound, np.ndarray):
+            return apply_bound
+        if apply_bound:
+            return np.ones(num_params, dtype=bool)
+        return None
+
+    @staticmethod
+    def _schedule_multiplier(schedule, t):
+        """
+        :returns: multiplier of the learning rate at step ``t`` given the ``schedule`` (see ``SGD``)
+        """
+        if schedule is None or schedule == 'constant':
+            return 1.
+        if schedule == 'inv_sqrt':
+            return 1. / math.sqrt(t)
+        if schedule == 'inv':
+            return 1. / t
+        if callable(schedule):
+            return schedule(t)
+        raise ValueError('unknown schedule: ' + str(schedule))
 
     @staticmethod
     def get_f_f_grad_from_model(model, x0, opt_indices, tracker, logger):
         """
         Receives a model and extracts needed functions and attributes to use the model with an optimiser.
 
+        The model is expected to calculate the objective function and its gradients together when its parameters are
+        set (``set_params``). They are therefore fetched from the model once for each distinct parameter, and ``f`` and
+        ``f_grad`` at the same parameter share the same evaluation.
+
         Parameters
         ----------
         model : object
@@ -85,39 +206,40 @@ class Optimizer:
          total evaluation of the objective function
 
         """
-        last_x = np.empty((1, x0.shape[0]))
-        last_x[0] = x0
-        best_f = {'f': None}
-        best_x = np.empty((1, x0.shape[0]))
-        best_x[0] = x0
-        best_f['f'] = model.objective_function()
+        # the objective function and its gradients are calculated together by the model, and therefore they are
+        # evaluated once for each distinct parameter and stored until the parameters change
+        evaluated = {'x': x0.copy(), 'f': model.objective_function(), 'g': model.objective_function_gradients()}
+        best = {'x': evaluated['x'], 'f': evaluated['f']}
         total_f_evals = np.array([0])
 
         def update(x):
-            if np.array_equal(x, last_x[0]):
+            if evaluated['x'] is not None and np.array_equal(x, evaluated['x']):
                 return
-            # p = x0.copy()
-            # p[opt_indices] = x[opt_indices]
             try:
-                model.set_params(x.copy())
+                # the model copies the parameters into its own buffers
+                model.set_params(x)
                 total_f_evals[0] += 1
-                last_x[0] = x
+                obj = model.objective_function()
+                grad = model.objective_function_gradients()
             except (ValueError, JitChol) as e:
-                best_x[0] = last_x[0].copy()
+                if evaluated['x'] is not None:
+                    best['x'] = evaluated['x']
+                # the model is not at any evaluated point until it is updated again
+                evaluated['x'] = None
                 raise OptTermination(e)
-            if best_f['f'] is None:
-                best_f['f'] = model.objective_function()
-            else:
-                if model.objective_function() < best_f['f']:
-                    best_f['f'] = model.objective_function()
-                    best_x[0] = x
+            evaluated['x'] = x.copy()
+            evaluated['f'] = obj
+            evaluated['g'] = grad
+            if obj < best['f']:
+                best['f'] = obj
+                best['x'] = evaluated['x']
 
         def f(X=None):
             if X is not None:
                 update(X)
-            obj = model.objective_function()
+            obj = evaluated['f']
             tracker.append(obj)
-            logger.debug('objective:' + "%.4f" % model.objective_function())
+            logger.debug('objective:' + "%.4f" % obj)
             return obj
 
         def f_grad(X=None):
@@ -125,11 +247,11 @@ class Optimizer:
                 update(X)
 
             g = np.zeros(len(x0))
-            g[opt_indices] = model.objective_function_gradients().copy()[opt_indices]
+            g[opt_indices] = evaluated['g'][opt_indices]
             return g
 
         def min_x():
-            return best_x[0]
+            return best['x']
 
         def total_evals():
             return total_f_evals[0]
@@ -157,8 +279,9 @@ class Optimizer:
         max_fun : int (optional)
          maximum number of function evaluations
 
-        apply_bound : boolean (optional)
-         whether to apply bounds. If True, parameters will be limited to be less than log (1e10)
+        apply_bound : boolean or ndarray (optional)
+         whether to apply bounds. If True, parameters will be limited to be less than log (1e10). If it is a boolean
+         array, the bound is only applied to the parameters for which it is True.
 
         """
         start = model.get_params()
@@ -167,10 +290,14 @@ class Optimizer:
 
         tracker = []
         bounds = None
-        if apply_bound:
+        bounded = Optimizer._bound_mask(apply_bound, start.shape[0])
+        if bounded is not None:
             bounds = []
             for x in range(start.shape[0]):
-                bounds.append((None, math.log(1e+10)))
+                if bounded[x]:
+                    bounds.append((None, math.log(1e+10)))
+                else:
+                    bounds.append((None, None))
         init_x = model.get_params()
         f, f_grad, update, best_x, total_evals = Optimizer.get_f_f_grad_from_model(model, init_x, opt_indices, tracker, logger)
         restart_opt = True
@@ -198,15 +325,285 @@ class Optimizer:
         return d, tracker
 
 
+    @staticmethod
+    def NGD(model, logger, max_fun=None, learning_rate=0.1, max_learning_rate=1.0, ftol=1e-7):
+        """
+        Optimises the posterior distribution of the ``model`` using natural gradient descent, where the natural
+        gradient is calculated by ``model.MoG.natural_gradient``. The model should be configured to expose only the
+        posterior parameters (``Configuration.MoG``).
+
+        The step size is adapted: after a step which decreases the objective function the learning rate is increased
+        (up to ``max_learning_rate``), and a step which increases the objective function (or fails) is rejected and the
+        learning rate is halved. Rejecting bad steps makes the method robust against noise in the estimated gradients
+        of ell.
+
+        Parameters
+        ----------
+        model : model
+         the model to optimise
+
+        logger : logger
+         logger used for logging
+
+        max_fun : int (optional)
+         maximum number of function evaluations
+
+        learning_rate : float (optional)
+         initial learning rate
+
+        max_learning_rate : float (optional)
+         maximum learning rate. A natural gradient step with learning rate 1 is the exact update for conjugate models.
+
+        ftol : float (optional)
+         the optimisation stops when the relative decrease in the objective function is less than ``ftol``
+        """
+        start = model.get_params()
+        if start.shape[0] != model.MoG.num_parameters():
+            raise ValueError('natural gradient is only available for the parameters of the posterior')
+
+        tracker = []
+        f, f_grad, update, best_x, total_evals = Optimizer.get_f_f_grad_from_model(model, start, range(0, len(start)),
+                                                                                   tracker, logger)
+        x = start.copy()
+        obj = f()
+        while (max_fun is None or total_evals() < max_fun) and learning_rate > 1e-10:
+            new_x = x - learning_rate * model.MoG.natural_gradient(f_grad())
+            try:
+                new_obj = f(new_x)
+            except OptTermination:
+                new_obj = float('Inf')
+            if np.isfinite(new_obj) and new_obj <= obj:
+                converged = obj - new_obj < ftol * abs(obj)
+                x, obj = new_x, new_obj
+                learning_rate = min(learning_rate * 1.5, max_learning_rate)
+                if converged:
+                    break
+            else:
+                logger.debug('step rejected, learning rate: ' + str(learning_rate / 2))
+                update(x)
+                learning_rate /= 2
+        update(best_x())
+        d = {}
+        d['funcalls'] = total_evals()
+        return d, tracker
+
+    @staticmethod
+    def LBFGS(model, logger, max_fun=None, apply_bound=False, memory=None, memory_size=10, ftol=1e-9, gtol=1e-5):
+        """
+        Optimises the ``model`` using limited-memory BFGS with a backtracking line search. Unlike ``BFGS``, the
+        curvature pairs are kept in ``memory``, and therefore passing the same memory to subsequent optimisations of
+        the same set of parameters starts them with the approximation of the Hessian built by the previous
+        optimisations.
+
+        Parameters
+        ----------
+        model : model
+         the model to optimise
+
+        logger : logger
+         logger used for logging
+
+        max_fun : int (optional)
+         maximum number of function evaluations
+
+        apply_bound : boolean or ndarray (optional)
+         whether to apply bounds (see ``BFGS``). Steps are projected onto the bounds.
+
+        memory : LBFGSMemory (optional)
+         curvature pairs from previous optimisations. It is updated during the optimisation, and is cleared if it was
+         built for a different number of parameters.
+
+        memory_size : int (optional)
+         number of curvature pairs to keep when ``memory`` is not provided
+
+        ftol : float (optional)
+         the optimisation stops when the relative decrease in the objective function is less than ``ftol``
+
+        gtol : float (optional)
+         the optimisation stops when the largest element of the (projected) gradient is less than ``gtol``
+        """
+        start = model.get_params()
+        if memory is None:
+            memory = LBFGSMemory(memory_size)
+        if memory.num_params != start.shape[0]:
+            memory.clear(start.shape[0])
+        bounded = Optimizer._bound_mask(apply_bound, start.shape[0])
+        upper = math.log(1e+10)
+
+        tracker = []
+        f, f_grad, update, best_x, total_evals = Optimizer.get_f_f_grad_from_model(model, start, range(0, len(start)),
+                                                                                   tracker, logger)
+        x = start.copy()
+        obj = f()
+        g = f_grad()
+        while max_fun is None or total_evals() < max_fun:
+            direction = -memory.H_mult(g)
+            if bounded is not None:
+                direction[bounded & (x >= upper) & (direction > 0)] = 0
+            if np.dot(direction, g) >= 0:
+                logger.debug('not a descent direction, memory cleared')
+                memory.clear(x.shape[0])
+                direction = -g
+            if np.absolute(direction).max() < gtol:
+                break
+            # without curvature information the first step is limited, in the same way as in ``fmin_l_bfgs_b``
+            step = 1. if memory.s else min(1., 1. / np.sqrt(np.dot(g, g)))
+            while True:
+                new_x = x + step * direction
+                if bounded is not None:
+                    new_x[bounded] = np.minimum(new_x[bounded], upper)
+                try:
+                    new_obj = f(new_x)
+                except OptTermination:
+                    new_obj = float('Inf')
+                if np.isfinite(new_obj) and new_obj <= obj + 1e-4 * np.dot(g, new_x - x):
+                    break
+                step /= 2
+                if step < 1e-10 or (max_fun is not None and total_evals() >= max_fun):
+                    break
+            if not (np.isfinite(new_obj) and new_obj <= obj):
+                logger.debug('line search failed')
+                break
+            new_g = f_grad()
+            memory.add(new_x - x, new_g - g)
+            converged = obj - new_obj <= ftol * max(abs(obj), abs(new_obj), 1.)
+            x, obj, g = new_x, new_obj, new_g
+            if converged:
+                break
+        update(best_x())
+        d = {}
+        d['funcalls'] = total_evals()
+        return d, tracker
+
+    @staticmethod
+    def multi_start(model_factory, logger, num_starts=4, num_top=1, init='mog', seed=0, n_processes=None,
+                    start_iters=2, method=None, iters_per_opt=None, **kwargs):
+        """
+        Optimises several initialisations of a model for a short budget in parallel, and continues the optimisation
+        of the best one. Initialisation ``i`` is built by ``model_factory`` after seeding the random generator with
+        ``seed + i``, and is then randomised, except for initialisation 0.
+
+        Initialisations are optimised in a pool of processes, which are created by forking the current process.
+        ``model_factory`` is inherited by the processes rather than sent to them, and therefore the training data it
+        refers to is shared by the processes and is not copied (it should not be modified by the models). Only images
+        of the models (see ``SAVIGP.image``) are sent back.
+
+        Parameters
+        ----------
+        model_factory : callable
+         a function which receives an image of the model (or None) and returns the model, e.g.,
+         lambda image: SAVIGP_Diag(X, Y, ..., image=image)
+
+        logger : logger
+         logger
+
+        num_starts : int
+         number of initialisations
+
+        num_top : int
+         number of best initialisations which are returned in ``candidates``
+
+        init : string
+         how initialisations are randomised: 'mog' (``SAVIGP.rand_init_mog``), 'inducing'
+         (``SAVIGP.rand_init_inducing``) or 'both'
+
+        seed : int
+         seed of the random generator of the first initialisation
+
+        n_processes : int
+         number of processes. If None, the number of CPUs is used.
+
+        start_iters : int
+         maximum number of global optimisations of each initialisation (``max_iters`` in ``optimize_model``)
+
+        method, iters_per_opt, kwargs :
+         passed to ``optimize_model`` for optimising both the initialisations and the best model. 'callback' and
+         'validation' are only used for the best model.
+
+        Returns
+        -------
+        model, avg_time, total_time, obj_track, total_evals :
+         the output of ``optimize_model`` for the best initialisation
+
+        candidates : list
+         for the ``num_top`` best initialisations, a dictionary containing the index of the initialisation ('start'),
+         objective function ('obj') and number of function evaluations ('evals') after the short optimisation, and
+         the image of the model ('image'), ordered by the objective function
+        """
+        if init not in ['mog', 'inducing', 'both']:
+            raise ValueError('unknown initialisation: ' + str(init))
+        if iters_per_opt is None:
+            iters_per_opt = {'mog': 25, 'hyp': 25, 'll': 25}
+        _multi_start_state.update({'model_factory': model_factory, 'logger': logger, 'init': init, 'seed': seed,
+                                   'method': method, 'iters_per_opt': iters_per_opt, 'start_iters': start_iters,
+                                   'kwargs': dict((k, v) for k, v in kwargs.items()
+                                                  if k not in ['callback', 'max_iters', 'current_iter', 'validation'])})
+        pool = multiprocessing.Pool(n_processes)
+        try:
+            results = pool.map(_multi_start_worker, range(num_starts))
+        finally:
+            pool.close()
+            pool.join()
+            _multi_start_state.clear()
+
+        results = sorted([r for r in results if np.isfinite(r['obj'])], key=lambda r: r['obj'])
+        if not results:
+            raise OptTermination('optimisation failed for all the initialisations')
+        for r in results:
+            logger.info('start ' + str(r['start']) + ' obj: ' + str(r['obj']) + ' fun evals: ' + str(r['evals']))
+        candidates = results[:num_top]
+        logger.info('continuing start ' + str(candidates[0]['start']))
+        model = model_factory(candidates[0]['image'])
+        return Optimizer.optimize_model(model, None, logger, method, iters_per_opt=iters_per_opt, **kwargs) + \
+            (candidates,)
 
     @staticmethod
     def print_short(a):
         return ["%.2f" % a[j] for j in range(len(a))]
 
+    @staticmethod
+    def _optimize_phase(model, logger, phase, max_fun, optimizers, apply_bound=False, memories=None):
+        """
+        Optimises the parameters in the current configuration of the ``model`` using the optimiser given for
+        ``phase`` in ``optimizers`` (see ``optimize_model``). ``memories`` is a dictionary which keeps the memory of
+        'lbfgs' for each phase between calls.
+
+        Returns
+        -------
+        d : dictionary
+         contains the number of function evaluations ('funcalls')
+
+        tracker : list
+         objective function values during the optimisation
+        """
+        name = optimizers.get(phase, 'bfgs')
+        options = {}
+        if isinstance(name, tuple):
+            name, options = name
+            options = dict(options)
+        if name == 'bfgs':
+            return Optimizer.BFGS(model, logger, max_fun=max_fun, apply_bound=apply_bound)
+        if name == 'lbfgs':
+            memory_size = options.pop('memory_size', 10)
+            if memories is None:
+                memories = {}
+            if phase not in memories:
+                memories[phase] = LBFGSMemory(memory_size)
+            return Optimizer.LBFGS(model, logger, max_fun=max_fun, apply_bound=apply_bound, memory=memories[phase],
+                                   **options)
+        if name == 'ngd':
+            if phase != 'mog':
+                raise ValueError('natural gradient is only available for the posterior parameters')
+            return Optimizer.NGD(model, logger, max_fun=max_fun, **options)
+        if name in Optimizer.first_order_methods:
+            return Optimizer.SGD(model, logger, max_fun=max_fun, method=name, apply_bound=apply_bound, **options)
+        raise ValueError('unknown optimiser: ' + str(name))
+
     @staticmethod
     def optimize_model(model, max_fun_evals, logger,
                        method=None, xtol=1e-4, iters_per_opt=[25, 25, 25], max_iters=200,
-                       ftol =1e-5, callback=None, current_iter=None):
+                       ftol =1e-5, callback=None, current_iter=None, optimizers=None, scheduler=None,
+                       validation=None):
         """
         Optimised model in an EM manner, i.e., each set of parameters are optimised independently, i.e.,
 
@@ -226,12 +623,17 @@ class Optimizer:
 
         method : list
          the set of parameters to optimise. For example method = ['mog', 'hyp'] will optimise posterior distribution
-         and hyper-parameters.
+         and hyper-parameters. If it contains 'joint', the parameters are optimised together in a single configuration
+         and a single optimiser run in each iteration, and ell and its gradients wrt to all the parameters are
+         calculated in the same pass over the data. For example method = ['joint', 'mog', 'hyp'] will optimise
+         posterior distribution and hyper-parameters jointly, and method = ['joint'] will optimise all the parameters
+         (posterior, hyper-parameters, likelihood parameters and inducing points) jointly.
 
         iters_per_opt : dictionary
          a dictionary containing maximum number of function evaluations for each subset of parameters in each local
          optimisation. For example, iters_per_opt = {'mog' : 25, 'hyp' : 30} will update posterior parameters (mog)
-         for a maximum of 25 function evaluations and hyper-parameter for a maximum of 30 function evaluation.
+         for a maximum of 25 function evaluations and hyper-parameter for a maximum of 30 function evaluation. The
+         number of function evaluations of the joint optimisation is given by 'joint'.
 
         max_iters : int
          maximum number of global optimisations.
@@ -249,10 +651,38 @@ class Optimizer:
         current_iter : int
          current iteration of the optimisation. It is useful for example in the case that the optimisation is continued
          from a previous optimisation.
+
+        optimizers : dictionary
+         the optimiser to use for each subset of parameters. For example optimizers = {'mog': 'ngd'} will optimise
+         posterior parameters using natural gradient descent (``NGD``). Subsets which are not specified are optimised
+         using 'bfgs', and the optimiser of the joint optimisation is given by 'joint'. 'ngd' is only available for
+         'mog'. First-order optimisers ('sgd', 'adam' and 'adagrad', see ``SGD``) are available for all the subsets,
+         and their options can be given as a tuple of the name and a dictionary of options, e.g.,
+         {'hyp': ('adam', {'learning_rate': 0.05, 'clip': 10.})}. 'lbfgs' (see ``LBFGS``) keeps the approximation of
+         the Hessian of each subset between iterations.
+
+        scheduler : PhaseScheduler (optional)
+         if provided, the number of function evaluations of each subset of parameters in each iteration is decided by
+         the scheduler (instead of ``iters_per_opt``), which also stops the optimisation when its time budget is
+         exhausted.
+
+        validation : EarlyStopping (optional)
+         if provided, the model is evaluated on a validation set at the end of iterations, the optimisation is
+         stopped when NLPD on the validation set does not improve, and the parameters with the lowest NLPD are
+         restored at the end of the optimisation.
         """
 
         if not method:
             method=['hyp', 'mog']
+        joint = 'joint' in method
+        if joint:
+            joint_config = [Configuration.ENTROPY, Configuration.CROSS, Configuration.ELL]
+            for name, group in [('mog', Configuration.MoG), ('hyp', Configuration.HYPER), ('ll', Configuration.LL),
+                                ('inducing', Configuration.INDUCING)]:
+                if name in method or method == ['joint']:
+                    joint_config.append(group)
+        if optimizers is None:
+            optimizers = {}
         if not (max_fun_evals is None):
             iters_per_opt = min(max_fun_evals, iters_per_opt)
         converged=False
@@ -261,23 +691,63 @@ class Optimizer:
         last_param_m = None
         last_param_s = None
         obj_track = []
+        # curvature pairs of 'lbfgs' for each phase, which are kept between iterations
+        memories = {}
         if current_iter is None:
             current_iter = 0
         last_obj = None
         delta_m = None
         delta_s = None
+        def run_phase(phase, config, apply_bound=False):
+            """
+            Optimises the parameters of ``phase`` under configuration ``config``, and returns the output of the
+            optimiser. If the scheduler skips the phase, the output contains 'skipped'.
+            """
+            if scheduler is None:
+                budget = iters_per_opt[phase]
+            else:
+                budget = scheduler.budget(phase)
+                if not budget:
+                    return {'funcalls': 0, 'skipped': True}, []
+            logger.info(phase + ' params')
+            # if the configuration does not change between phases (e.g., in the joint optimisation) the caches are kept
+            if set(model.config_list) != set(config):
+                model.set_configuration(config)
+            if phase == 'joint':
+                # all the parameters except the posterior are bounded, which keeps the line search away from large
+                # steps in the likelihood parameters
+                apply_bound = np.ones(model.get_params().shape[0], dtype=bool)
+                for group, sl, _ in model._config_slices():
+                    apply_bound[sl] = group != Configuration.MoG
+            obj_before = model.objective_function()
+            phase_start = time.time()
+            d, tracker = Optimizer._optimize_phase(model, logger, phase, budget, optimizers, apply_bound=apply_bound,
+                                                   memories=memories)
+            if scheduler is not None:
+                scheduler.record(phase, d['funcalls'], obj_before - model.objective_function(),
+                                 time.time() - phase_start, model.objective_function())
+            return d, tracker
+
         try:
             while (max_iters is None) or current_iter < max_iters:
                 logger.info('iter started ' + str(current_iter))
-                if 'mog' in method:
-                    logger.info('MoG params')
-                    model.set_configuration([
+                if scheduler is not None and not scheduler.next_iteration():
+                    break
+                skipped = []
+                if joint:
+                    d, tracker = run_phase('joint', joint_config)
+                    skipped.append('skipped' in d)
+                    obj_track += tracker
+                    total_evals += d['funcalls']
+
+                if 'mog' in method and not joint:
+                    d, tracker = run_phase('mog', [
                         Configuration.MoG,
                         Configuration.ENTROPY,
                         Configuration.CROSS,
                         Configuration.ELL,
                     ])
-                    d, tracker = Optimizer.BFGS(model, logger, max_fun=iters_per_opt['mog'])
+                    skipped.append('skipped' in d)
                     obj_track += tracker
                     total_evals += d['funcalls']
 
@@ -286,14 +756,16 @@ class Optimizer:
                     callback(model, current_iter + 1, total_evals, delta_m, delta_s, obj_track)
                     logger.info('callback finished')
 
-                # check for convergence
+                # check for convergence. The posterior does not change if the scheduler has skipped its optimisation,
+                # which is not a sign of convergence.
+                posterior_skipped = bool(skipped) and skipped[-1]
                 new_params_m, new_params_s = model.get_posterior_params()
                 if last_param_m is not None:
                     delta_m = np.absolute(new_params_m - last_param_m).mean()
                     delta_s = np.absolute(new_params_s - last_param_s).mean()
                     logger.debug('ftol: ' + str(last_obj - model.objective_function()))
                     logger.info('diff:' + 'm:' +  str(delta_m) + ' s:' + str(delta_s))
-                    if (delta_m + delta_s) / 2 < xtol or \
+                    if ((delta_m + delta_s) / 2 < xtol and not posterior_skipped) or \
                             ((last_obj > model.objective_function()) and (last_obj - model.objective_function() < ftol)):
                         logger.info('best obj found: ' + str(model.objective_function()))
                         break
@@ -301,43 +773,47 @@ class Optimizer:
                 last_param_s = new_params_s
                 last_obj = model.objective_function()
 
-                if 'll' in method:
-                    logger.info('ll params')
-                    model.set_configuration([
+                if 'll' in method and not joint:
+                    d, tracker = run_phase('ll', [
                         Configuration.ELL,
                         Configuration.LL
                     ])
-                    d, tracker = Optimizer.BFGS(model, logger, max_fun=iters_per_opt['ll'])
+                    skipped.append('skipped' in d)
                     obj_track += tracker
                     total_evals += d['funcalls']
 
-                if 'hyp' in method:
-                    logger.info('hyp params')
-                    model.set_configuration([
+                if 'hyp' in method and not joint:
+                    d, tracker = run_phase('hyp', [
                         Configuration.ENTROPY,
                         Configuration.CROSS,
                         Configuration.ELL,
                         Configuration.HYPER
-                    ])
-                    d, tracker = Optimizer.BFGS(model, logger, max_fun=iters_per_opt['hyp'], apply_bound=True)
+                    ], apply_bound=True)
+                    skipped.append('skipped' in d)
                     obj_track += tracker
                     total_evals += d['funcalls']
 
-                if 'inducing' in method:
-                    logger.info('inducing params')
-                    model.set_configuration([
+                if 'inducing' in method and not joint:
+                    d, tracker = run_phase('inducing', [
                         Configuration.ENTROPY,
                         Configuration.CROSS,
                         Configuration.ELL,
                         Configuration.INDUCING
-                    ])
-                    d, tracker = Optimizer.BFGS(model, logger, max_fun=iters_per_opt['inducing'], apply_bound=True)
+                    ], apply_bound=True)
+                    skipped.append('skipped' in d)
                     obj_track += tracker
                     total_evals += d['funcalls']
 
+                if skipped and all(skipped):
+                    logger.info('scheduler: all the phases are skipped')
+                    break
+
                 if not (max_fun_evals is None) and total_evals > max_fun_evals:
                     break
 
+                if validation is not None and validation.evaluate(model, current_iter + 1):
+                    break
+
                 current_iter += 1
 
         except KeyboardInterrupt:
@@ -345,6 +821,8 @@ class Optimizer:
             logger.info('last obj: ' + str(model.objective_function()))
             if total_evals == 0:
                 total_evals = float('Nan')
+        if validation is not None:
+            validation.restore(model)
         end=time.time()
         if total_evals == 0:
             avg_time = None
@@ -353,6 +831,346 @@ class Optimizer:
         return model, avg_time, (end - start), obj_track, total_evals
 
 
+_multi_start_state = {}
+""" arguments of ``Optimizer.multi_start``, which are inherited by the processes of the pool """
+
+
+def _multi_start_worker(start):
+    """
+    Builds initialisation ``start`` of ``Optimizer.multi_start`` and optimises it for a short budget.
+
+    Returns
+    -------
+    :returns: a dictionary containing the index of the initialisation ('start'), objective function ('obj'), number
+    of function evaluations ('evals') and image of the model ('image'). The objective function is Inf if the
+    optimisation has failed.
+    """
+    state = _multi_start_state
+    logger = state['logger']
+    try:
+        np.random.seed(state['seed'] + start)
+        model = state['model_factory'](None)
+        if start > 0:
+            if state['init'] in ['inducing', 'both']:
+                model.rand_init_inducing()
+            if state['init'] in ['mog', 'both']:
+                model.rand_init_mog()
+                model.set_configuration(model.config_list)
+        _, _, _, _, total_evals = Optimizer.optimize_model(model, None, logger, state['method'],
+                                                           iters_per_opt=state['iters_per_opt'],
+                                                           max_iters=state['start_iters'], **state['kwargs'])
+        return {'start': start, 'obj': model.objective_function(), 'evals': total_evals, 'image': model.image()}
+    except (OptTermination, JitChol, ValueError) as e:
+        logger.warning('start ' + str(start) + ' failed: ' + str(e))
+        return {'start': start, 'obj': float('Inf'), 'evals': 0, 'image': None}
+
+
+class LBFGSMemory:
+    """
+    Curvature pairs (s, y) of L-BFGS, where s is the change in the parameters and y is the change in the gradient, and
+    multiplication by the corresponding approximation of the inverse Hessian using the two-loop recursion.
+
+    Parameters
+    ----------
+    size : int
+     maximum number of pairs to keep
+    """
+
+    def __init__(self, size=10):
+        self.size = size
+        self.num_params = None
+        self.s = []
+        self.y = []
+        self.rho = []
+
+    def clear(self, num_params=None):
+        self.num_params = num_params
+        self.s = []
+        self.y = []
+        self.rho = []
+
+    def add(self, s, y):
+        """
+        Adds the pair (s, y). Pairs which do not satisfy the curvature condition (s^T y > 0) are skipped, which keeps
+        the approximation positive definite.
+        """
+        sy = np.dot(s, y)
+        if sy <= 1e-10 * np.dot(y, y):
+            return
+        self.s.append(s)
+        self.y.append(y)
+        self.rho.append(1. / sy)
+        if len(self.s) > self.size:
+            del self.s[0], self.y[0], self.rho[0]
+
+    def H_mult(self, g):
+        """
+        :returns: H g, where H is the approximation of the inverse Hessian. H is the identity if there is no pair.
+        """
+        q = g.copy()
+        alpha = np.empty(len(self.s))
+        for i in reversed(range(len(self.s))):
+            alpha[i] = self.rho[i] * np.dot(self.s[i], q)
+            q -= alpha[i] * self.y[i]
+        if self.s:
+            q *= np.dot(self.s[-1], self.y[-1]) / np.dot(self.y[-1], self.y[-1])
+        for i in range(len(self.s)):
+            beta = self.rho[i] * np.dot(self.y[i], q)
+            q += (alpha[i] - beta) * self.s[i]
+        return q
+
+
+class PhaseScheduler:
+    """
+    Decides the number of function evaluations of each phase (subset of parameters) in each iteration of
+    ``Optimizer.optimize_model``.
+
+    The improvement in the objective function per function evaluation is tracked for each phase (as a moving
+    average), and the total budget of an iteration, which is the sum of ``iters_per_opt`` over the phases being
+    optimised, is divided between the phases in proportion to their rates of improvement. A phase whose last improvement is less than ``rtol`` times the
+    objective function is skipped for ``retry_every`` iterations, after which it is tried again. The optimisation is
+    stopped when ``time_budget`` is exhausted, and budgets are limited to the number of evaluations which are
+    expected to fit in the remaining time. All the decisions are logged.
+
+    Parameters
+    ----------
+    iters_per_opt : dictionary
+     initial number of function evaluations of each phase, e.g., {'mog': 25, 'hyp': 25, 'll': 25}
+
+    logger : logger
+     logger used for logging the decisions
+
+    min_evals : int
+     minimum number of function evaluations of a phase which is not skipped
+
+    max_evals : int (optional)
+     maximum number of function evaluations of a phase. If None, it is the total budget of an iteration.
+
+    rtol : float
+     a phase is skipped when its improvement is less than ``rtol`` times the absolute value of the objective function
+
+    retry_every : int
+     number of iterations after which a skipped phase is tried again
+
+    time_budget : float (optional)
+     maximum time of the optimisation in seconds
+
+    explore : float
+     fraction of the budget which is divided uniformly between the phases, so that a phase with a small rate still
+     receives function evaluations
+
+    smoothing : float
+     weight of the previous rate in the moving average of the rates
+    """
+
+    def __init__(self, iters_per_opt, logger, min_evals=5, max_evals=None, rtol=1e-6, retry_every=3,
+                 time_budget=None, explore=0.2, smoothing=0.5):
+        self.iters_per_opt = dict(iters_per_opt)
+        self.logger = logger
+        self.min_evals = min_evals
+        self.max_evals = max_evals
+        self.rtol = rtol
+        self.retry_every = retry_every
+        self.time_budget = time_budget
+        self.explore = explore
+        self.smoothing = smoothing
+        self.start = time.time()
+        self.iteration = 0
+        self.rates = {}
+        """ moving average of the improvement of the objective function per function evaluation of each phase """
+        self.eval_time = {}
+        """ average time of a function evaluation in each phase """
+        self.skipped_at = {}
+        """ the iteration in which each converged phase was skipped """
+        self.phases = set()
+        """ the phases which have been scheduled """
+
+    def _remaining_time(self):
+        if self.time_budget is None:
+            return float('Inf')
+        return self.time_budget - (time.time() - self.start)
+
+    def next_iteration(self):
+        """
+        Should be called at the start of each iteration.
+
+        :returns: False if the time budget is exhausted and the optimisation should stop, otherwise True
+        """
+        self.iteration += 1
+        if self._remaining_time() <= 0:
+            self.logger.info('scheduler: time budget exhausted')
+            return False
+        return True
+
+    def budget(self, phase):
+        """
+        :returns: number of function evaluations of ``phase`` in the current iteration. Zero means that the phase is
+        skipped.
+        """
+        self.phases.add(phase)
+        if phase in self.skipped_at:
+            if self.iteration - self.skipped_at[phase] < self.retry_every:
+                self.logger.info('scheduler: ' + phase + ' skipped')
+                return 0
+            del self.skipped_at[phase]
+            self.logger.info('scheduler: ' + phase + ' retried')
+        remaining = self._remaining_time()
+        if remaining <= 0:
+            self.logger.info('scheduler: ' + phase + ' skipped, time budget exhausted')
+            return 0
+
+        total = sum([self.iters_per_opt[p] for p in self.phases])
+        active = [p for p in self.phases if p not in self.skipped_at]
+        if phase not in self.rates or any([p not in self.rates for p in active]):
+            evals = self.iters_per_opt[phase]
+        else:
+            total_rate = sum([self.rates[p] for p in active])
+            share = self.explore / len(active)
+            if total_rate > 0:
+                share += (1. - self.explore) * self.rates[phase] / total_rate
+            else:
+                share += (1. - self.explore) / len(active)
+            evals = int(round(total * share))
+        max_evals = self.max_evals if self.max_evals is not None else total
+        evals = min(max(evals, self.min_evals), max_evals)
+        if phase in self.eval_time and self.eval_time[phase] > 0:
+            evals = min(evals, max(1, int(remaining / self.eval_time[phase])))
+        self.logger.info('scheduler: ' + phase + ' budget ' + str(evals) +
+                         ' (rate: ' + str(self.rates.get(phase)) + ')')
+        return evals
+
+    def record(self, phase, evals, improvement, duration, obj):
+        """
+        Records the result of the optimisation of ``phase``.
+
+        Parameters
+        ----------
+        phase : string
+         the phase
+
+        evals : int
+         number of function evaluations
+
+        improvement : float
+         decrease in the objective function
+
+        duration : float
+         time of the optimisation in seconds
+
+        obj : float
+         objective function after the optimisation
+        """
+        if evals > 0:
+            rate = max(improvement, 0.) / evals
+            if phase in self.rates:
+                rate = self.smoothing * self.rates[phase] + (1. - self.smoothing) * rate
+            self.rates[phase] = rate
+            self.eval_time[phase] = duration / evals
+        self.logger.info('scheduler: ' + phase + ' improvement ' + str(improvement) + ' in ' + str(evals) +
+                         ' evaluations')
+        if improvement < self.rtol * abs(obj):
+            self.logger.info('scheduler: ' + phase + ' converged')
+            self.skipped_at[phase] = self.iteration
+
+
+class EarlyStopping:
+    """
+    Evaluates the model on a validation set every ``every`` iterations of ``Optimizer.optimize_model``, and stops the
+    optimisation when NLPD on the validation set has not improved for ``patience`` evaluations. The parameters with
+    the lowest NLPD are kept, and are restored by ``restore`` at the end of the optimisation.
+
+    Kernels between the validation points and the inducing points are cached by the model (see ``SAVIGP.predict``),
+    and therefore evaluations after which only the posterior has changed do not recalculate them.
+
+    Parameters
+    ----------
+    Xval : ndarray
+     input of the validation points. Dimensions: N * D
+
+    Yval : ndarray
+     output of the validation points. Dimensions: N * O
+
+    logger : logger
+     logger used for logging NLPD and the error of each evaluation
+
+    every : int
+     number of iterations between evaluations
+
+    patience : int
+     number of evaluations without improvement after which the optimisation is stopped
+
+    min_delta : float
+     minimum decrease in NLPD which is considered as an improvement
+
+    Attributes
+    ----------
+    history : list
+     (iteration, NLPD, error) of each evaluation, where NLPD is the average over the validation points. The error
+     is the error rate for classification ('LogisticLL' and 'SoftmaxLL'), and mean squared error otherwise.
+    """
+
+    def __init__(self, Xval, Yval, logger, every=1, patience=5, min_delta=0.):
+        self.Xval = Xval
+        self.Yval = Yval
+        self.logger = logger
+        self.every = every
+        self.patience = patience
+        self.min_delta = min_delta
+        self.history = []
+        self.best_nlpd = None
+        self.best_iter = None
+        self.best_image = None
+        self.num_bad = 0
+
+    @staticmethod
+    def error(model, Y, Ypred):
+        """
+        :returns: error rate of the prediction ``Ypred`` for classification, and mean squared error otherwise
+        """
+        if isinstance(model.cond_likelihood, LogisticLL):
+            return ((Ypred[:, 0] > 0.5) != (Y[:, 0] == 1)).mean()
+        if isinstance(model.cond_likelihood, SoftmaxLL):
+            return (np.argmax(Ypred, axis=1) != np.argmax(Y, axis=1)).mean()
+        return np.square(Ypred - Y).mean()
+
+    def evaluate(self, model, current_iter):
+        """
+        Evaluates the model if ``current_iter`` is a multiple of ``every``.
+
+        Returns
+        -------
+        :returns: whether the optimisation should be stopped
+        """
+        if current_iter % self.every != 0:
+            return False
+        Ypred, _, nlpd = model.predict(self.Xval, self.Yval, cache_key='validation')
+        nlpd = nlpd.mean()
+        error = EarlyStopping.error(model, self.Yval, Ypred)
+        self.history.append((current_iter, nlpd, error))
+        self.logger.info('validation: iter ' + str(current_iter) + ' nlpd ' + str(nlpd) + ' error ' + str(error))
+        if self.best_nlpd is None or nlpd < self.best_nlpd - self.min_delta:
+            self.best_nlpd = nlpd
+            self.best_iter = current_iter
+            self.best_image = model.image()
+            self.num_bad = 0
+            return False
+        self.num_bad += 1
+        if self.num_bad >= self.patience:
+            self.logger.info('validation: no improvement in ' + str(self.num_bad) + ' evaluations, best iter ' +
+                             str(self.best_iter) + ' nlpd ' + str(self.best_nlpd))
+            return True
+        return False
+
+    def restore(self, model):
+        """
+        Restores the parameters with the lowest NLPD on the validation set, if the model has changed since.
+        """
+        if self.best_image is None or np.array_equal(model.get_all_params(), self.best_image['params']):
+            return
+        self.logger.info('validation: restored parameters of iter ' + str(self.best_iter))
+        model.set_all_params(self.best_image['params'])
+
+
 class OptTermination(Exception):
     """
     a specific class to indicate problems during optimisation, e.g., problems in function evaluation.
@@ -1,7 +1,6 @@
 import threading
 import math
 
-import GPy
 from atom.enum import Enum
 from scipy.misc import logsumexp
 from sklearn.cluster import MiniBatchKMeans, KMeans
@@ -9,7 +8,7 @@ from GPy.util.linalg import mdot
 import numpy as np
 from scipy.linalg import cho_solve, solve_triangular
 from GPy.core import Model
-from util import mdiag_dot, jitchol, pddet, inv_chol
+from util import mdiag_dot, jitchol, pddet
 
 
 class Configuration(Enum):
@@ -63,7 +62,9 @@ class SAVIGP(Model):
      inducing points will be in the objective function gradient.
 
     latent_noise : float
-     the amount of latent noise that will be added to the kernel.
+     the amount of latent noise that will be added to the kernel, i.e., the kernel of each latent process is
+     K(x, x') + latent_noise * I. The noise is added directly to the diagonal of the kernels, and does not change
+     K(Z, X) or the gradients of the kernels.
 
     exact_ell : boolean
      whether to use exact log likelihood provided by the ``likelihood`` method. If ``exact_ell`` is False, log likelihood
@@ -85,6 +86,21 @@ class SAVIGP(Model):
      and calculated the quantities for each using a separate thread.
     """
 
+    dependencies = {
+        'chol': (Configuration.HYPER, Configuration.INDUCING),
+        'A': (Configuration.HYPER, Configuration.INDUCING),
+        'N_z': (Configuration.MoG,),
+        'ent': (Configuration.MoG,),
+        'cross': (Configuration.MoG, Configuration.HYPER, Configuration.INDUCING),
+        'ell': (Configuration.MoG, Configuration.HYPER, Configuration.INDUCING, Configuration.LL),
+    }
+    """
+    Quantities which are cached between updates, and the groups of parameters that they depend on. 'chol' is the
+    kernels of the inducing points and their decompositions, 'A' is A, Kzx and Ktilda for each partition of data, 'N_z'
+    is the quantities calculated by ``update_N_z``, and 'ent', 'cross' and 'ell' are the terms of ELBO and their
+    gradients.
+    """
+
     def __init__(self, X, Y,
                  num_inducing,
                  num_mog_comp,
@@ -175,6 +191,30 @@ class SAVIGP(Model):
         self.cached_cross = None
         """ current cross entropy term """
 
+        self._dirty = set(self.dependencies.keys())
+        """ cached quantities which are not valid anymore and should be recalculated """
+
+        self._seen_params = {}
+        """ values of the groups of parameters when the cached quantities were last checked (see ``_find_changes``) """
+
+        self.cache_stats = {}
+        """ number of cache hits and misses of each cached quantity in each phase (see ``_recompute``) """
+
+        self._A_cache = {}
+        """ A, Kzx and Ktilda for each partition of data """
+
+        self._jitter_memory = {}
+        """ jitters which were needed for decomposing the kernels of the inducing points (see ``util.jitchol``) """
+
+        self.max_A_cache_size = None
+        """ maximum number of elements of A, Kzx and Ktilda that are cached over all partitions. If data is larger,
+        they are recalculated for each partition in every update. If None, the limit is the size of a single partition
+        (see ``_A_cache_limit``), and therefore caching does not exceed the memory set by ``partition_size``. """
+
+        self._predict_cache = None
+        """ cache key, value of ``self.chol_version`` and A, Kzx and Ktilda of the partitions of the test points which
+        were last predicted with a cache key (see ``predict``) """
+
         self.Z = None
         """ position of inducing points. Dimensions: Q * M * D """
 
@@ -187,18 +227,41 @@ class SAVIGP(Model):
             self.Z = image['Z']
 
         # Z is Q * M * D
+        self._param_groups = [(Configuration.MoG, self.MoG.num_parameters()),
+                              (Configuration.HYPER, self.num_latent_proc * self.num_hyper_params),
+                              (Configuration.LL, self.num_like_params),
+                              (Configuration.INDUCING, self.Z.size)]
+        """ groups of parameters and their sizes, in the order in which they are exposed to the optimiser """
+
+        self._params = np.empty(sum([size for _, size in self._param_groups]))
+        """ all the parameters of the model in a single array, in the same order as ``get_all_params``. Parameters of
+        the posterior and the inducing points are views into this array, and therefore setting them does not need
+        further copies. Kernels and the likelihood own their parameters, which are copied to this array when they
+        change. """
+
+        self.MoG._init_parameters(self._params[self._param_slice(Configuration.MoG)])
+        self._params[self._param_slice(Configuration.INDUCING)] = self.Z.flatten()
+        self.Z = self._params[self._param_slice(Configuration.INDUCING)].reshape(self.Z.shape)
+        self._params[self._param_slice(Configuration.HYPER)] = np.log(self.kernel_hyp_params().flatten())
+        self._params[self._param_slice(Configuration.LL)] = self.cond_likelihood.get_params()
         self.Kzz = np.array([np.empty((self.num_inducing, self.num_inducing))] * self.num_latent_proc)
         """ kernel values for each latent process. Dimension: Q * M * M """
 
-        self.invZ = np.array([np.empty((self.num_inducing, self.num_inducing))] * self.num_latent_proc)
-        """ inverse of the kernels. Dimension: Q * M * M """
-
         self.chol = np.array([np.zeros((self.num_inducing, self.num_inducing))] * self.num_latent_proc)
         """ Cholesky decomposition of the kernels. Dimension: Q * M * M """
 
         self.log_detZ = np.zeros(self.num_latent_proc)
         """ logarithm of determinant of each kernel : log det K(Z[j], Z[j]) """
 
+        self.chol_version = 0
+        """ incremented every time ``self.chol`` is updated """
+
+        self._cross_terms_key = None
+        self._cross_terms_cache = None
+        self._dcross_K_key = None
+        self._dcross_K_cache = None
+
+
         # self._sub_parition()
         self.X_partitions, self.Y_partitions, self.n_partitions, self.partition_size = self._partition_data(X, Y)
 
@@ -214,7 +277,7 @@ class SAVIGP(Model):
         # self.normal_samples = np.repeat(self.normal_samples[:, :, np.newaxis], self.partition_size, 2)
 
         self.ll = None
-        """ evidence lower bound (ELBO) """
+        """ evidence lower bound (ELBO). It is None when the last update of the model failed """
 
         self.grad_ll = None
         """ gradient of evidence lower bound (ELBO) wrt to the parameters """
@@ -222,7 +285,7 @@ class SAVIGP(Model):
         if image:
             self.set_all_params(image['params'])
         else:
-            self._update_latent_kernel()
+            self._kernels_changed()
 
             self._update_inverses()
 
@@ -276,6 +339,7 @@ class SAVIGP(Model):
         self.X_partitions.append(self.X[inducing_index])
         self.Y_partitions.append(self.Y[inducing_index])
         self.cached_ell = None
+        self._dirty.update(['A', 'ell'])
         self.n_partitions = 1
 
     def _max_partition_size(self):
@@ -334,9 +398,10 @@ class SAVIGP(Model):
 
         return Z, init_m
 
-    def _random_inducing_points(self, X, Y):
+    def _random_inducing_points(self, X, Y, seed=12000):
         """
-        Determines position of the inducing point by random positioning them on the training data.
+        Determines position of the inducing point by random positioning them on the training data. The random
+        generator is seeded with ``seed``, unless it is None.
 
         Returns
         -------
@@ -349,7 +414,8 @@ class SAVIGP(Model):
 
         """
 
-        np.random.seed(12000)
+        if seed is not None:
+            np.random.seed(seed)
         Z = np.array([np.zeros((self.num_inducing, self.input_dim))] * self.num_latent_proc)
         init_m = np.empty((self.num_inducing, self.num_latent_proc))
         for j in range(self.num_latent_proc):
@@ -363,14 +429,12 @@ class SAVIGP(Model):
 
         return Z, init_m
 
-    def _update_latent_kernel(self):
+    def _kernels_changed(self):
         """
-        Updates kernels by adding a latent noise to each kernel.
+        Should be called after the hyper-parameters of the kernels are changed. Kernels are updated in place (through
+        ``param_array``), and this function only marks their decompositions for recalculation.
         """
 
-        self.kernels_latent = []
-        for j in range(len(self.kernels)):
-            self.kernels_latent.append(self.kernels[j] + GPy.kern.White(self.X.shape[1], variance=self.latent_noise))
         self.hypers_changed = True
 
     def init_mog(self, init_m):
@@ -392,6 +456,19 @@ class SAVIGP(Model):
         """
         self.MoG.random_init()
 
+    def rand_init_inducing(self):
+        """
+        Randomly places the inducing points on the training data using the current state of the random generator, and
+        initialises the posterior distribution accordingly.
+        """
+        Z, init_m = self._random_inducing_points(self.X, self.Y, seed=None)
+        # self.Z is a view into self._params
+        self.Z[:] = Z
+        self.inducing_changed = True
+        self._update_inverses()
+        self.init_mog(init_m)
+        self.set_configuration(self.config_list)
+
     def _get_mog(self):
         """
         :returns: the MoG used for representing the posterior. It should be implemented by sub-classes.
@@ -399,6 +476,14 @@ class SAVIGP(Model):
 
         raise NotImplementedError
 
+    def update_N_z(self):
+        """
+        Calculates the quantities used in the entropy term (``log_z`` and, for mixtures, ``log_N_kl``). It should be
+        implemented by sub-classes, and is called by ``_update`` only when the posterior has changed.
+        """
+
+        raise NotImplementedError
+
     def get_param_names(self):
         """
         :returns: an array containing name of the parameters of the class given the current configuration.
@@ -434,18 +519,20 @@ class SAVIGP(Model):
         :returns: a dictionary containing an image of the class which can be used to init the model from.
         """
 
-        return {'params': self.get_all_params(), 'Z': self.Z}
+        return {'params': self.get_all_params(), 'Z': self.Z.copy()}
 
     def _update_inverses(self):
         """
-        Calculates and stores kernel, and its inverses.
+        Calculates and stores kernels, their Cholesky decompositions and log-determinants. Inverse of the kernels are
+        not stored, and products with K(Z[j], Z[j]) ^ -1 are calculated using triangular solves against ``self.chol``.
         """
 
         for j in range(self.num_latent_proc):
-            self.Kzz[j, :, :] = self.kernels_latent[j].K(self.Z[j, :, :])
-            self.chol[j, :, :] = jitchol(self.Kzz[j, :, :])
-            self.invZ[j, :, :] = inv_chol(self.chol[j, :, :])
+            self.Kzz[j, :, :] = self.kernels[j].K(self.Z[j, :, :])
+            self.Kzz[j][np.diag_indices(self.num_inducing)] += self.latent_noise
+            self.chol[j, :, :] = jitchol(self.Kzz[j, :, :], memory=self._jitter_memory, key=('Kzz', j))
             self.log_detZ[j] = pddet(self.chol[j, :, :])
+        self.chol_version += 1
         self.hypers_changed = False
         self.inducing_changed = False
 
@@ -465,11 +552,23 @@ class SAVIGP(Model):
         variables for future uses.
         """
 
-        self.ll = 0
+        # ELBO is only set when the update is finished, so that a failed update leaves the model marked as not updated
+        self.ll = None
+        ll = 0
+        self._find_changes()
+        if self._recompute('N_z'):
+            self.update_N_z()
+
+        # gradients are accumulated in place into the parts of the gradient buffer that correspond to each group
+        grad_slices = self._config_slices()
+        if self.grad_ll is None or self.grad_ll.shape[0] != grad_slices[-1][1].stop:
+            self.grad_ll = np.empty(grad_slices[-1][1].stop)
+        self.grad_ll[:] = 0
+        grad = dict([(group, self.grad_ll[sl]) for group, sl, _ in grad_slices])
 
         if Configuration.MoG in self.config_list:
-            grad_m = np.zeros((self.MoG.m_dim()))
-            grad_s = np.zeros((self.MoG.get_s_size()))
+            grad_m = grad[Configuration.MoG][:self.MoG.get_m_size()].reshape(self.MoG.m_dim())
+            grad_s = grad[Configuration.MoG][self.MoG.get_m_size():(self.MoG.get_m_size() + self.MoG.get_s_size())]
             grad_pi = np.zeros((self.MoG.pi_dim()))
 
         if Configuration.HYPER in self.config_list:
@@ -477,39 +576,60 @@ class SAVIGP(Model):
             grad_hyper = np.zeros(self.hyper_params.shape)
 
         if Configuration.INDUCING in self.config_list:
-            grad_inducing = np.zeros((self.num_latent_proc, self.num_inducing, self.input_dim))
+            grad_inducing = grad[Configuration.INDUCING].reshape((self.num_latent_proc, self.num_inducing,
+                                                                  self.input_dim))
 
-        if self.hypers_changed or self.inducing_changed:
+        if self._recompute('chol') or self.hypers_changed or self.inducing_changed:
             self._update_inverses()
 
         if Configuration.ENTROPY in self.config_list or (self.cached_ent is None):
-            self.cached_ent = self._l_ent()
+            if self._recompute('ent') or self.cached_ent is None:
+                self.cached_ent = self._l_ent()
+                self.cached_ent_grad = {}
+                if Configuration.MoG in self.config_list:
+                    self.cached_ent_grad[Configuration.MoG] = \
+                        (self._d_ent_d_m(), self._transformed_d_ent_d_S(), self._d_ent_d_pi())
+                if Configuration.HYPER in self.config_list:
+                    self.cached_ent_grad[Configuration.HYPER] = self._dent_dhyper()
             if Configuration.MoG in self.config_list:
-                grad_m += self._d_ent_d_m()
-                grad_s += self._transformed_d_ent_d_S()
-                grad_pi += self._d_ent_d_pi()
+                grad_m += self.cached_ent_grad[Configuration.MoG][0]
+                grad_s += self.cached_ent_grad[Configuration.MoG][1]
+                grad_pi += self.cached_ent_grad[Configuration.MoG][2]
             if Configuration.HYPER in self.config_list:
-                grad_hyper += self._dent_dhyper()
-        self.ll += self.cached_ent
+                grad_hyper += self.cached_ent_grad[Configuration.HYPER]
+        ll += self.cached_ent
 
         if Configuration.CROSS in self.config_list or (self.cached_cross is None):
-            xcross, xdcorss_dpi = self._cross_dcorss_dpi(0)
-            self.cached_cross = xcross
+            if self._recompute('cross') or self.cached_cross is None:
+                xcross, xdcorss_dpi = self._cross_dcorss_dpi(0)
+                self.cached_cross = xcross
+                self.cached_cross_grad = {}
+                if Configuration.MoG in self.config_list:
+                    self.cached_cross_grad[Configuration.MoG] = \
+                        (self._dcorss_dm(), self.transform_dcorss_dS(), xdcorss_dpi)
+                if Configuration.HYPER in self.config_list:
+                    self.cached_cross_grad[Configuration.HYPER] = self._dcross_dhyper()
+                if Configuration.INDUCING in self.config_list:
+                    self.cached_cross_grad[Configuration.INDUCING] = self._dcross_dinducing()
             if Configuration.MoG in self.config_list:
-                grad_m += self._dcorss_dm()
-                grad_s += self.transform_dcorss_dS()
-                grad_pi += xdcorss_dpi
+                grad_m += self.cached_cross_grad[Configuration.MoG][0]
+                grad_s += self.cached_cross_grad[Configuration.MoG][1]
+                grad_pi += self.cached_cross_grad[Configuration.MoG][2]
             if Configuration.HYPER in self.config_list:
-                grad_hyper += self._dcross_dhyper()
+                grad_hyper += self.cached_cross_grad[Configuration.HYPER]
             if Configuration.INDUCING in self.config_list:
-                grad_inducing += self._dcross_dinducing()
+                grad_inducing += self.cached_cross_grad[Configuration.INDUCING]
 
-        self.ll += self.cached_cross
+        ll += self.cached_cross
 
         if Configuration.ELL in self.config_list:
-            xell, xdell_dm, xdell_ds, xdell_dpi, xdell_hyper, xdell_dll, xdell_dinduc = self._ell()
+            if self._recompute('A'):
+                self._A_cache = {}
+            if self._recompute('ell') or self.cached_ell_out is None:
+                self.cached_ell_out = self._ell()
+            xell, xdell_dm, xdell_ds, xdell_dpi, xdell_hyper, xdell_dll, xdell_dinduc = self.cached_ell_out
             self.cached_ell = xell
-            self.ll += xell
+            ll += xell
             if Configuration.MoG in self.config_list:
                 grad_m += xdell_dm
                 grad_s += self.MoG.transform_S_grad(xdell_ds)
@@ -519,27 +639,49 @@ class SAVIGP(Model):
             if Configuration.INDUCING in self.config_list:
                 grad_inducing += xdell_dinduc
 
-        self.grad_ll = np.array([])
         if Configuration.MoG in self.config_list:
-            self.grad_ll = np.hstack([grad_m.flatten(),
-                                      grad_s,
-                                      self.MoG.transform_pi_grad(grad_pi),
-            ])
+            grad[Configuration.MoG][(self.MoG.get_m_size() + self.MoG.get_s_size()):] = \
+                self.MoG.transform_pi_grad(grad_pi)
 
         if Configuration.HYPER in self.config_list:
-            self.grad_ll = np.hstack([self.grad_ll,
-                                      (grad_hyper.flatten()) * self.hyper_params.flatten()
-                                      ])
+            grad[Configuration.HYPER][:] = grad_hyper.flatten() * self.hyper_params.flatten()
 
         if Configuration.LL in self.config_list:
-            self.grad_ll = np.hstack([self.grad_ll,
-                                      xdell_dll
-                                      ])
+            grad[Configuration.LL][:] = xdell_dll
 
-        if Configuration.INDUCING in self.config_list:
-            self.grad_ll = np.hstack([self.grad_ll,
-                                      grad_inducing.flatten()
-                                      ])
+        self.ll = ll
+
+    def _param_slice(self, group):
+        """
+        :returns: the slice of ``self._params`` which contains the parameters in ``group``
+        """
+        start = 0
+        for g, size in self._param_groups:
+            if g == group:
+                return slice(start, start + size)
+            start += size
+
+    def _config_slices(self):
+        """
+        Returns a list of (group, slice in the parameters exposed to the optimiser, slice in ``self._params``) for the
+        groups of parameters in the configuration.
+        """
+        slices = []
+        start = 0
+        for group, size in self._param_groups:
+            if group in self.config_list:
+                slices.append((group, slice(start, start + size), self._param_slice(group)))
+                start += size
+        if not slices:
+            slices.append((None, slice(0, 0), slice(0, 0)))
+        return slices
+
+    def _sync_params(self):
+        """
+        Copies parameters of the kernels and the likelihood, which are not views, into ``self._params``.
+        """
+        self._params[self._param_slice(Configuration.HYPER)] = np.log(self.kernel_hyp_params().flatten())
+        self._params[self._param_slice(Configuration.LL)] = self.cond_likelihood.get_params()
 
     def set_configuration(self, config_list):
         self.config_list = config_list
@@ -548,35 +690,97 @@ class SAVIGP(Model):
 
     def _clear_cache(self):
         self.cached_ell = None
+        self.cached_ell_out = None
         self.cached_cross = None
         self.cached_ent = None
+        self._dirty.update(['ent', 'cross', 'ell'])
+
+    def _invalidate(self, group):
+        """
+        Marks the cached quantities which depend on the group of parameters ``group`` (for example
+        ``Configuration.HYPER``) as invalid.
+        """
+        for node, groups in self.dependencies.items():
+            if group in groups:
+                self._dirty.add(node)
+
+    def _find_changes(self):
+        """
+        Compares each group of parameters with its value when this function was last called, and invalidates the
+        cached quantities that depend on the groups which have changed. Posterior parameters are compared using
+        ``MoG.version``, and therefore changes made directly to ``self.MoG`` are also detected.
+        """
+        current = self._current_params()
+        for group in self._changed_groups(current):
+            self._invalidate(group)
+        self._seen_params = current
+
+    def _current_params(self):
+        """
+        :returns: a dictionary containing the current value of each group of parameters, as used by ``_find_changes``
+        """
+        return {Configuration.MoG: self.MoG.version,
+                Configuration.HYPER: self.kernel_hyp_params(),
+                Configuration.LL: np.array(self.cond_likelihood.get_params()),
+                Configuration.INDUCING: self.Z.copy()}
+
+    def _changed_groups(self, current=None):
+        """
+        :returns: the groups of parameters which have changed since ``_find_changes`` was last called
+        """
+        if current is None:
+            current = self._current_params()
+        return [group for group, value in current.items()
+                if group not in self._seen_params or not np.array_equal(self._seen_params[group], value)]
+
+    def _recompute(self, node):
+        """
+        Returns whether the cached quantity ``node`` should be recalculated, and marks it as valid. Hits and misses
+        are counted in ``self.cache_stats`` for the current phase, which is identified by the configuration.
+        """
+        phase = '+'.join([str(c) for c in self.config_list])
+        stats = self.cache_stats.setdefault(phase, {}).setdefault(node, {'hits': 0, 'misses': 0})
+        if node in self._dirty:
+            self._dirty.discard(node)
+            stats['misses'] += 1
+            return True
+        stats['hits'] += 1
+        return False
+
+    def reset_cache_stats(self):
+        self.cache_stats = {}
 
     def set_params(self, p):
         """
         Sets the internal parameters of the model.
 
         :param p: input parameters. ``p`` should contain parameters specified in the configuration.
+
+        The objective function and its gradients are not updated if ``p`` is the same as the current parameters, and
+        the model has not changed since the last update (for example by changing ``self.MoG`` directly).
         """
         self.last_param = p
-        index = 0
-        if Configuration.MoG in self.config_list:
-            self.MoG.update_parameters(p[:self.MoG.num_parameters()])
-            index = self.MoG.num_parameters()
-        if Configuration.HYPER in self.config_list:
-            self.hyper_params = np.exp(p[index:(index + self.num_latent_proc * self.num_hyper_params)].
-                                       reshape((self.num_latent_proc, self.num_hyper_params)))
-            for j in range(self.num_latent_proc):
-                self.kernels[j].param_array[:] = self.hyper_params[j]
-            index += self.num_latent_proc * self.num_hyper_params
-            self._update_latent_kernel()
-
-        if Configuration.LL in self.config_list:
-            self.cond_likelihood.set_params(p[index:index + self.num_like_params])
-            index += self.num_like_params
-
-        if Configuration.INDUCING in self.config_list:
-            self.Z = p[index:].reshape((self.num_latent_proc, self.num_inducing, self.input_dim))
-            self.inducing_changed = True
+        changed = [(group, sl, param_sl) for group, sl, param_sl in self._config_slices()
+                   if group is not None and not np.array_equal(p[sl], self._params[param_sl])]
+        if not changed and self.ll is not None and not self._dirty and not self._changed_groups():
+            return
+        self.ll = None
+        for group, sl, param_sl in changed:
+            if group == Configuration.MoG:
+                self.MoG.update_parameters(p[sl])
+            elif group == Configuration.HYPER:
+                self._params[param_sl] = p[sl]
+                self.hyper_params = np.exp(p[sl].reshape((self.num_latent_proc, self.num_hyper_params)))
+                for j in range(self.num_latent_proc):
+                    self.kernels[j].param_array[:] = self.hyper_params[j]
+                self._kernels_changed()
+            elif group == Configuration.LL:
+                self._params[param_sl] = p[sl]
+                self.cond_likelihood.set_params(self._params[param_sl])
+            elif group == Configuration.INDUCING:
+                # self.Z is a view into self._params
+                self._params[param_sl] = p[sl]
+                self.inducing_changed = True
 
         self._update()
 
@@ -592,8 +796,14 @@ class SAVIGP(Model):
         for j in range(self.num_latent_proc):
             self.kernels[j].param_array[:] = self.hyper_params[j]
         index += self.num_latent_proc * self.num_hyper_params
-        self._update_latent_kernel()
+        self._kernels_changed()
         self.cond_likelihood.set_params(p[index:index + self.num_like_params])
+        index += self.num_like_params
+        if p.shape[0] > index:
+            # self.Z is a view into self._params
+            self._params[self._param_slice(Configuration.INDUCING)] = p[index:]
+            self.inducing_changed = True
+        self._sync_params()
         self._clear_cache()
         self._update()
 
@@ -601,29 +811,19 @@ class SAVIGP(Model):
         """
         Returns parameters of the model according to the configuration.
         """
-        params = np.array([])
-        if Configuration.MoG in self.config_list:
-            params = self.MoG.parameters
-        if Configuration.HYPER in self.config_list:
-            params = np.hstack([params, np.log(self.hyper_params.flatten())])
-        if Configuration.LL in self.config_list:
-            params = np.hstack([params, self.cond_likelihood.get_params()])
-        if Configuration.INDUCING in self.config_list:
-            params = np.hstack([params, self.Z.flatten()])
-        return params.copy()
+        self._sync_params()
+        return np.concatenate([self._params[param_sl] for _, _, param_sl in self._config_slices()])
 
     def get_posterior_params(self):
-        return self.MoG.get_m_S_params()
+        m, s = self.MoG.get_m_S_params()
+        return m.copy(), s.copy()
 
     def get_all_params(self):
         """
         Returns all internal parameters of the model.
         """
-        params = self.MoG.parameters
-        params = np.hstack([params, np.log(self.kernel_hyp_params().flatten())])
-        params = np.hstack([params, self.cond_likelihood.get_params()])
-        params = np.hstack([params, self.Z.flatten()])
-        return params
+        self._sync_params()
+        return self._params.copy()
 
     def log_likelihood(self):
         return self.ll
@@ -641,7 +841,7 @@ class SAVIGP(Model):
         """
         calculates diagonal terms of K_tilda for latent process ``j`` (see paper for the definition of Ktilda)
         """
-        return self.kernels_latent[j].Kdiag(p_X) - mdiag_dot(A, K)
+        return self.kernels[j].Kdiag(p_X) + self.latent_noise - mdiag_dot(A, K)
 
 
     def _b(self, k, j, Aj, Kzx):
@@ -687,11 +887,50 @@ class SAVIGP(Model):
         K = np.empty((self.num_latent_proc, p_X.shape[0]))
         Kzx = np.empty((self.num_latent_proc, self.num_inducing, p_X.shape[0]))
         for j in range(self.num_latent_proc):
-            Kzx[j, :, :] = self.kernels_latent[j].K(self.Z[j, :, :], p_X)
+            Kzx[j, :, :] = self.kernels[j].K(self.Z[j, :, :], p_X)
             A[j] = self._A(j, Kzx[j, :, :])
             K[j] = self._Kdiag(p_X, Kzx[j, :, :], A[j], j)
         return A, Kzx, K
 
+    def _A_cache_limit(self):
+        """
+        :returns: maximum number of elements of A, Kzx and Ktilda that are cached, which is
+         ``self.max_A_cache_size``, or the number of elements in a single partition if it is None
+        """
+        if self.max_A_cache_size is None:
+            return self._max_partition_size() * self.num_latent_proc * (2 * self.num_inducing + 1)
+        return self.max_A_cache_size
+
+    def _cached_A_K(self, p_X, p):
+        """
+        Returns ``_get_A_K(p_X)`` for partition ``p``, which is cached until the hyper-parameters or the inducing points
+        change, as long as the total size of the cache is less than ``_A_cache_limit()``. Partitions are
+        calculated by separate threads, but each thread only accesses its own entry of the cache.
+        """
+        if p is None or self.num_data_points * self.num_latent_proc * (2 * self.num_inducing + 1) > \
+                self._A_cache_limit():
+            return self._get_A_K(p_X)
+        if p not in self._A_cache:
+            self._A_cache[p] = self._get_A_K(p_X)
+        return self._A_cache[p]
+
+    def _cached_predict_A_K(self, X_partitions, cache_key):
+        """
+        Returns ``_get_A_K`` for each partition of test points in ``X_partitions``. If ``cache_key`` is not None, they
+        are cached until ``self.chol_version`` changes, as long as their size is less than ``_A_cache_limit()``. Only
+        the last key is kept, and a call with another key replaces the cache. Otherwise None is returned for each
+        partition, in which case they are calculated by ``_predict_comp``.
+        """
+        n_points = sum([p_X.shape[0] for p_X in X_partitions])
+        if cache_key is None or n_points * self.num_latent_proc * (2 * self.num_inducing + 1) > \
+                self._A_cache_limit():
+            return [None] * len(X_partitions)
+        if self._predict_cache is None or self._predict_cache[:2] != (cache_key, self.chol_version):
+            # releases the previous entry before calculating the new one
+            self._predict_cache = None
+            self._predict_cache = (cache_key, self.chol_version, [self._get_A_K(p_X) for p_X in X_partitions])
+        return self._predict_cache[2]
+
     def _dell_ds(self, k, j, cond_ll, A, n_sample, sigma_kj):
         """
         Returns gradient of ell wrt to the posterior covariance for component ``k`` and latent process ``j``.
@@ -710,12 +949,13 @@ class SAVIGP(Model):
         lock = threading.Lock()
 
         class MyThread(threading.Thread):
-            def __init__(self, savigp, X, Y, output):
+            def __init__(self, savigp, X, Y, output, p):
                 super(MyThread, self).__init__()
                 self.output = output
                 self.X = X
                 self.Y = Y
                 self.savigp = savigp
+                self.p = p
 
             def run(self):
                 threadLimiter.acquire()
@@ -725,7 +965,7 @@ class SAVIGP(Model):
                     threadLimiter.release()
 
             def Executemycode(self):
-                out = self.savigp._parition_ell(self.X, self.Y)
+                out = self.savigp._parition_ell(self.X, self.Y, self.p)
                 lock.acquire()
                 try:
                     if not self.output:
@@ -740,7 +980,7 @@ class SAVIGP(Model):
         total_out = []
         threads = []
         for p in range(0, self.n_partitions):
-            t = MyThread(self, self.X_partitions[p], self.Y_partitions[p], total_out)
+            t = MyThread(self, self.X_partitions[p], self.Y_partitions[p], total_out, p)
             threads.append(t)
             t.start()
 
@@ -749,9 +989,10 @@ class SAVIGP(Model):
 
         return total_out[0]
 
-    def _parition_ell(self, X, Y):
+    def _parition_ell(self, X, Y, p=None):
         """
-        calculating expected log-likelihood, and it's derivatives for input ``X`` and output ``Y``.
+        calculating expected log-likelihood, and it's derivatives for input ``X`` and output ``Y``. ``p`` is the index
+        of the partition, which is used for caching A, Kzx and Ktilda (see ``_cached_A_K``).
 
         Returns
         -------
@@ -803,7 +1044,7 @@ class SAVIGP(Model):
                 self.calculate_dhyper() or \
                 Configuration.INDUCING in self.config_list:
             total_ell = 0
-            A, Kzx, K = self._get_A_K(X)
+            A, Kzx, K = self._cached_A_K(X, p)
             mean_kj = np.empty((self.num_mog_comp, self.num_latent_proc, X.shape[0]))
             sigma_kj = np.empty((self.num_mog_comp, self.num_latent_proc, X.shape[0]))
             F = np.empty((self.n_samples, X.shape[0], self.num_latent_proc))
@@ -821,36 +1062,10 @@ class SAVIGP(Model):
                     d_ell_dm[k, j] = self._proj_m_grad(j, mdot(m, Kzx[j].T)) * self.MoG.pi[k]
                     d_ell_ds[k, j] = self._dell_ds(k, j, cond_ll, A, sigma_kj, norm_samples)
                     if self.calculate_dhyper():
-                        ds_dhyp = self._dsigma_dhyp(j, k, A[j], Kzx, X)
-                        db_dhyp = self._db_dhyp(j, k, A[j], X)
-                        for h in range(self.num_hyper_params):
-                            d_ell_d_hyper[j, h] += -1. / 2 * self.MoG.pi[k] * (
-                                self._average(cond_ll,
-                                              np.ones(cond_ll.shape) / sigma_kj[k, j] * ds_dhyp[:, h] +
-                                              -2. * norm_samples / np.sqrt(sigma_kj[k, j]) * db_dhyp[:, h]
-                                              - np.square(norm_samples) / sigma_kj[k, j] * ds_dhyp[:, h], True)).sum()
+                        d_ell_d_hyper[j] += self._dell_dhyper_kj(k, j, cond_ll, norm_samples, sigma_kj, A, Kzx, X)
 
                     if Configuration.INDUCING in self.config_list:
-                        db_dinduc = self._db_dinduc(j, k, A[j], X)
-                        ds_dinduc = self._dsigma_dinduc(j, k, A[j], Kzx, X)
-                        ds_dinduc = ds_dinduc.reshape(ds_dinduc.shape[0], ds_dinduc.shape[1] * ds_dinduc.shape[2])
-                        db_dinduc = db_dinduc.reshape(db_dinduc.shape[0], db_dinduc.shape[1] * db_dinduc.shape[2])
-
-                        d_ell_d_induc[j, :, :] = -1. / 2 * self.MoG.pi[k] *(mdot((cond_ll / sigma_kj[k,j]), ds_dinduc).mean(axis=0) + \
-                                                    -2. * mdot(cond_ll * norm_samples / np.sqrt(sigma_kj[k, j]), db_dinduc).mean(axis=0) \
-                                                    - mdot(cond_ll * np.square(norm_samples) / sigma_kj[k, j], ds_dinduc).mean(axis=0)).reshape((self.num_inducing, self.input_dim))
-
-                        # tmp_induc = np.empty(ds_dinduc.shape[1])
-                        # ds_dinduc[:, 1:1000].T[..., np.newaxis, np.newaxis] * (np.ones(cond_ll.shape) / sigma_kj[k, j])[:, None, :].T[np.newaxis, ...] + \
-                        # -2. * norm_samples / np.sqrt(sigma_kj[k, j]) * db_dinduc[:, q] \
-                        # - np.square(norm_samples) / sigma_kj[k, j] * ds_dinduc[:, q]
-                        # for q in range(ds_dinduc.shape[1]):
-                        #     tmp_induc[q] += -1. / 2 * self.MoG.pi[k] * (
-                        #         self._average(cond_ll,
-                        #                       np.ones(cond_ll.shape) / sigma_kj[k, j] * ds_dinduc[:, q] +
-                        #                       -2. * norm_samples / np.sqrt(sigma_kj[k, j]) * db_dinduc[:, q]
-                        #                       - np.square(norm_samples) / sigma_kj[k, j] * ds_dinduc[:, q], True)).sum()
-                        # d_ell_d_induc[j, :, :] = tmp_induc.reshape((self.num_inducing, self.input_dim))
+                        d_ell_d_induc[j] += self._dell_dinduc_kj(k, j, cond_ll, norm_samples, sigma_kj, A, Kzx, X)
 
                 sum_cond_ll = cond_ll.sum() / self.n_samples
                 total_ell += sum_cond_ll * self.MoG.pi[k]
@@ -868,6 +1083,46 @@ class SAVIGP(Model):
 
         return total_ell, d_ell_dm, d_ell_ds, d_ell_dPi, d_ell_d_hyper, d_ell_d_ll, d_ell_d_induc
 
+    def _dell_dhyper_kj(self, k, j, cond_ll, norm_samples, sigma_kj, A, Kzx, X):
+        r"""
+        Gradient of ell on partition ``X`` wrt to the hyper-parameters of latent process ``j``, through the posterior
+        of component ``k``.
+
+        Returns
+        -------
+        :returns: dell \\ dH[j]. Dimensions: |H|
+        """
+        ds_dhyp = self._dsigma_dhyp(j, k, A[j], Kzx, X)
+        db_dhyp = self._db_dhyp(j, k, A[j], X)
+        d_hyper = np.empty(self.num_hyper_params)
+        for h in range(self.num_hyper_params):
+            d_hyper[h] = -1. / 2 * self.MoG.pi[k] * (
+                self._average(cond_ll,
+                              np.ones(cond_ll.shape) / sigma_kj[k, j] * ds_dhyp[:, h] +
+                              -2. * norm_samples / np.sqrt(sigma_kj[k, j]) * db_dhyp[:, h]
+                              - np.square(norm_samples) / sigma_kj[k, j] * ds_dhyp[:, h], True)).sum()
+        return d_hyper
+
+    def _dell_dinduc_kj(self, k, j, cond_ll, norm_samples, sigma_kj, A, Kzx, X):
+        r"""
+        Gradient of ell on partition ``X`` wrt to the location of inducing points of latent process ``j``, through
+        the posterior of component ``k``.
+
+        Returns
+        -------
+        :returns: dell \\ dZ[j]. Dimensions: M * D
+        """
+        db_dinduc = self._db_dinduc(j, k, A[j], X)
+        ds_dinduc = self._dsigma_dinduc(j, k, A[j], Kzx, X)
+        ds_dinduc = ds_dinduc.reshape(ds_dinduc.shape[0], ds_dinduc.shape[1] * ds_dinduc.shape[2])
+        db_dinduc = db_dinduc.reshape(db_dinduc.shape[0], db_dinduc.shape[1] * db_dinduc.shape[2])
+
+        return -1. / 2 * self.MoG.pi[k] * (mdot((cond_ll / sigma_kj[k, j]), ds_dinduc).mean(axis=0) +
+                                           -2. * mdot(cond_ll * norm_samples / np.sqrt(sigma_kj[k, j]),
+                                                      db_dinduc).mean(axis=0)
+                                           - mdot(cond_ll * np.square(norm_samples) / sigma_kj[k, j],
+                                                  ds_dinduc).mean(axis=0)).reshape((self.num_inducing, self.input_dim))
+
     def _average(self, condll, X, variance_reduction):
         """
         calculates (condll * X).mean(axis=1) using variance reduction method.
@@ -981,7 +1236,7 @@ class SAVIGP(Model):
 
         :returns dF \\dH where (dF \\dH)[n] = dfn \\ dH
         """
-        w = mdot(self.invZ[j], m)
+        w = cho_solve((self.chol[j, :, :], True), m)
         return self.kernels[j].get_gradients_AK(w.T, X, self.Z[j]) - \
                self.kernels[j].get_gradients_SKD(Aj, w, self.Z[j])
 
@@ -1005,7 +1260,7 @@ class SAVIGP(Model):
 
         :returns dF \\dZ[j] where (dF \\dH)[n] = dfn \\ dZ[j]
         """
-        w = mdot(self.invZ[j], m)
+        w = cho_solve((self.chol[j, :, :], True), m)
         return self.kernels[j].get_gradients_X_AK(w, self.Z[j], X) - \
                self.kernels[j].get_gradients_X_SKD(Aj, w, self.Z[j])
 
@@ -1016,10 +1271,7 @@ class SAVIGP(Model):
         :returns a matrix of dimension K * Q * M, where K is the number of mixture components
         """
 
-        dcdm = np.empty((self.num_mog_comp, self.num_latent_proc, self.num_inducing))
-        for j in range(self.num_latent_proc):
-            dcdm[:, j, :] = -cho_solve((self.chol[j, :, :], True), self.MoG.m[:, j, :].T).T * self.MoG.pi[:, np.newaxis]
-        return dcdm
+        return -self._cross_terms()[1] * self.MoG.pi[:, np.newaxis, np.newaxis]
 
     def _dcross_ds(self):
         """
@@ -1032,11 +1284,7 @@ class SAVIGP(Model):
          dim(output) = K * Q * ``self.MoG.get_sjk_size()``
         """
 
-        dc_ds = np.empty((self.num_mog_comp, self.num_latent_proc, self.MoG.get_sjk_size()))
-        for j in range(self.num_latent_proc):
-            dc_ds[:, j] = -1. / 2 * np.array(
-                [self.MoG.dAinvS_dS(self.chol[j, :, :], k, j) * self.MoG.pi[k] for k in range(self.num_mog_comp)])
-        return dc_ds
+        return -1. / 2 * self._cross_terms()[3] * self.MoG.pi[:, np.newaxis, np.newaxis]
 
     def transform_dcorss_dS(self):
         r"""
@@ -1078,38 +1326,76 @@ class SAVIGP(Model):
         d_pi : ndarray
          dcross \\ dpi
         """
-        cross = 0
-        d_pi = np.zeros(self.num_mog_comp)
-        for j in range(self.num_latent_proc):
-            for k in range(self.num_mog_comp):
-                a = solve_triangular(self.chol[j, :, :], self.MoG.m[k, j, :], lower=True)
-                d_pi[k] += \
-                    N * math.log(2 * math.pi) + \
-                    self.log_detZ[j] + \
-                    + np.dot(a, a.T) + \
-                    self.MoG.tr_AinvS(self.chol[j, :, :], k, j)
-        for k in range(self.num_mog_comp):
-            cross += self.MoG.pi[k] * d_pi[k]
-
+        m_Kinv_m, _, tr_Kinv_S, _ = self._cross_terms()
+        d_pi = self.num_latent_proc * N * math.log(2 * math.pi) + self.log_detZ.sum() + \
+               (m_Kinv_m + tr_Kinv_S).sum(axis=1)
         d_pi *= -1. / 2
-        cross *= -1. / 2
-        return cross, d_pi
+        return np.dot(self.MoG.pi, d_pi), d_pi
+
+    def _cross_terms(self):
+        r"""
+        Calculates the terms which are shared between the cross term of ELBO and its gradients wrt to the posterior
+        parameters. For each latent process the means of all the components are solved against ``self.chol`` at once,
+        and so are the covariances (see ``MoG.tr_dAinvS_dS``). The results are memoized until either ``self.chol`` or
+        the posterior changes.
+
+        Returns
+        -------
+        m_Kinv_m : ndarray
+         m[k,j]^T K(Z[j], Z[j]) ^ -1 m[k,j]. Dimensions: K * Q
+
+        Kinv_m : ndarray
+         K(Z[j], Z[j]) ^ -1 m[k,j]. Dimensions: K * Q * M
+
+        tr_Kinv_S : ndarray
+         trace(K(Z[j], Z[j]) ^ -1 s[k,j]). Dimensions: K * Q
 
-    def _dcross_K(self, j):
+        d_tr_Kinv_S : ndarray
+         d trace(K(Z[j], Z[j]) ^ -1 s[k,j]) \\ ds[k,j] in the raw space. Dimensions: K * Q * ``self.MoG.get_sjk_size()``
+        """
+
+        key = (self.chol_version, self.MoG.version)
+        if self._cross_terms_key != key:
+            m_Kinv_m = np.empty((self.num_mog_comp, self.num_latent_proc))
+            Kinv_m = np.empty((self.num_mog_comp, self.num_latent_proc, self.num_inducing))
+            tr_Kinv_S = np.empty((self.num_mog_comp, self.num_latent_proc))
+            d_tr_Kinv_S = np.empty((self.num_mog_comp, self.num_latent_proc, self.MoG.get_sjk_size()))
+            for j in range(self.num_latent_proc):
+                a = solve_triangular(self.chol[j, :, :], self.MoG.m[:, j, :].T, lower=True)
+                m_Kinv_m[:, j] = np.square(a).sum(axis=0)
+                Kinv_m[:, j] = solve_triangular(self.chol[j, :, :], a, lower=True, trans=1).T
+                tr_Kinv_S[:, j], d_tr_Kinv_S[:, j] = self.MoG.tr_dAinvS_dS(self.chol[j, :, :], j)
+            self._cross_terms_cache = m_Kinv_m, Kinv_m, tr_Kinv_S, d_tr_Kinv_S
+            self._cross_terms_key = key
+        return self._cross_terms_cache
+
+    def _dcross_K(self):
         r"""
-        Gradient of the cross term of ELBO wrt to the kernel of latent process ``j``.
+        Gradient of the cross term of ELBO wrt to the kernels of the latent processes:
+
+         dcross \\ dK = -1/2 (K^-1 - K^-1 P K^-1),  where P = sum_k pi[k] (m[k,j] m[k,j]^T + s[k,j])
+
+        The mean part of P is a sum of K rank-one matrices, and K^-1 m[k,j] is taken from ``_cross_terms``. The
+        covariance part is summed over the components before the products with K^-1 (see ``MoG.sandwich_pi_S``), so
+        that the cost does not grow with the number of components. The results are memoized in the same way as
+        ``_cross_terms``.
 
         Returns
         -------
-        :returns: dcross \\ dK(Z[j], Z[j]). Dimensions: M * M
+        :returns: dcross \\ dK(Z[j], Z[j]) for all j. Dimensions: Q * M * M
         """
 
-        dc_dK = np.zeros((self.num_inducing, self.num_inducing))
-        for k in range(self.num_mog_comp):
-            dc_dK += -0.5 * self.MoG.pi[k] * (self.invZ[j]
-                                              - mdot(self.invZ[j], self.MoG.mmTS(k, j), self.invZ[j])
-                                              )
-        return dc_dK
+        key = (self.chol_version, self.MoG.version)
+        if self._dcross_K_key != key:
+            Kinv_m = self._cross_terms()[1]
+            eye = np.eye(self.num_inducing)
+            self._dcross_K_cache = np.empty((self.num_latent_proc, self.num_inducing, self.num_inducing))
+            for j in range(self.num_latent_proc):
+                Kinv = cho_solve((self.chol[j, :, :], True), eye)
+                Kinv_P_Kinv = mdot(Kinv_m[:, j].T * self.MoG.pi, Kinv_m[:, j]) + self.MoG.sandwich_pi_S(Kinv, j)
+                self._dcross_K_cache[j] = -0.5 * (self.MoG.pi.sum() * Kinv - Kinv_P_Kinv)
+            self._dcross_K_key = key
+        return self._dcross_K_cache
 
     def _dcross_dhyper(self):
         r"""
@@ -1120,9 +1406,10 @@ class SAVIGP(Model):
         :returns: dcross \\ dH. Dimensions: Q * |H|
         """
 
+        dc_dK = self._dcross_K()
         dc_dh = np.empty((self.num_latent_proc, self.num_hyper_params))
         for j in range(self.num_latent_proc):
-            self.kernels_latent[j].update_gradients_full(self._dcross_K(j), self.Z[j])
+            self.kernels[j].update_gradients_full(dc_dK[j], self.Z[j])
             dc_dh[j] = self.kernels[j].gradient.copy()
 
         return dc_dh
@@ -1136,9 +1423,10 @@ class SAVIGP(Model):
         :returns: dcross \\ dZ. Dimensions: Q * M * D
         """
 
+        dc_dK = self._dcross_K()
         dc_dindu = np.empty((self.num_latent_proc, self.num_inducing, self.input_dim))
         for j in range(self.num_latent_proc):
-            dc_dindu[j] = self.kernels_latent[j].gradients_X(self._dcross_K(j), self.Z[j])
+            dc_dindu[j] = self.kernels[j].gradients_X(dc_dK[j], self.Z[j])
 
         return dc_dindu
 
@@ -1177,7 +1465,11 @@ class SAVIGP(Model):
         -------
         :returns: d ent \\ dm. Dimensions: K * Q * M
         """
-        raise NotImplementedError
+        dent_dm = np.empty((self.num_mog_comp, self.num_latent_proc, self.num_inducing))
+        for k in range(self.num_mog_comp):
+            for j in range(self.num_latent_proc):
+                dent_dm[k, j, :] = self._d_ent_d_m_kj(k, j)
+        return dent_dm
 
     def _d_ent_d_pi(self):
         r"""
@@ -1188,21 +1480,53 @@ class SAVIGP(Model):
         dpi : ndarray
          d ent \\ dpi. Dimensions : K * 1
         """
+        pi = np.empty(self.num_mog_comp)
+        for k in range(self.num_mog_comp):
+            pi[k] = -self.log_z[k]
+            for l in range(self.num_mog_comp):
+                pi[k] -= self.MoG.pi[l] * (np.exp(self.log_N_kl[k, l] - self.log_z[l]))
+        return pi
 
-        raise NotImplementedError
+    def _d_ent_d_S_kj(self, k, j):
+        """
+        Calculates gradient of the entropy term of ELBO wrt to the posterior covariance for component ``k`` and latent
+        process ``j``. The returned gradient will be in the space of ``self.MoG.C_m_C``.
+        """
+        s_k = np.zeros(self.MoG.S_dim())
+        for l in range(self.num_mog_comp):
+            s_k += self.MoG.pi[k] * self.MoG.pi[l] * (np.exp(self.log_N_kl[l, k] - self.log_z[k]) +
+                                                      np.exp(self.log_N_kl[l, k] - self.log_z[l])) * \
+                   self.MoG.C_m_C(j, k, l)
+        return 1. / 2 * s_k
+
+    def _d_ent_d_S(self):
+        r"""
+        Calculated gradient of the entropy term of ELBO wrt to the posterior covariance.
+
+        Returns
+        -------
+        ds : ndarray
+         dent \\ ds. Dimensions : K * Q * ``self.MoG.S_dim()``
+
+        """
+        dent_ds = np.empty((self.num_mog_comp, self.num_latent_proc) + self.MoG.S_dim())
+        for k in range(self.num_mog_comp):
+            for j in range(self.num_latent_proc):
+                dent_ds[k, j] = self._d_ent_d_S_kj(k, j)
+        return dent_ds
 
     def _l_ent(self):
         """ returns entropy term of the ELBO. """
-        raise NotImplementedError
+        return -np.dot(self.MoG.pi, self.log_z)
 
     def _transformed_d_ent_d_S(self):
         r"""
         Calculates gradient of the entropy term wrt to the posterior covariance, and transforms it to the raw space
         and returns a flatten array.
         """
-        raise NotImplementedError
+        return self.MoG.transform_S_grad(self._d_ent_d_S())
 
-    def _predict_comp(self, Xs, Ys):
+    def _predict_comp(self, Xs, Ys, A_K=None):
         """
         Predicts output for test points ``Xs``, and also calculates NLPD if ``Ys`` is provided. The prediction is
         made for each mixture component separately.
@@ -1217,6 +1541,9 @@ class SAVIGP(Model):
         Ys : ndarray (or None)
          output at test points. Dimensions : N * O
 
+        A_K : tuple (optional)
+         ``_get_A_K(Xs)`` if it is already calculated
+
         Returns
         -------
         predicted_mu : ndarray
@@ -1231,7 +1558,9 @@ class SAVIGP(Model):
          for each output in the case of multi-output models.
         """
 
-        A, Kzx, K = self._get_A_K(Xs)
+        if A_K is None:
+            A_K = self._get_A_K(Xs)
+        A, Kzx, K = A_K
 
         predicted_mu = np.empty((Xs.shape[0], self.num_mog_comp, self.cond_likelihood.output_dim()))
         predicted_var = np.empty((Xs.shape[0], self.num_mog_comp, self.cond_likelihood.output_dim()))
@@ -1255,7 +1584,7 @@ class SAVIGP(Model):
 
         return predicted_mu, predicted_var, -logsumexp(nlpd, 2, self.MoG.pi)
 
-    def predict(self, Xs, Ys=None):
+    def predict(self, Xs, Ys=None, cache_key=None):
         """
         Makes prediction for test points ``Xs``, and calculates NLPD for ``Ys`` if it is provided.
 
@@ -1267,6 +1596,12 @@ class SAVIGP(Model):
         Ys : ndarray (optional)
          output at test points. Dimensions N * O, where O is the output dimensionality.
 
+        cache_key : object (optional)
+         if provided, A, Kzx and Ktilda of ``Xs`` are cached under this key until the hyper-parameters or the
+         inducing points change, or ``predict`` is called with another key, so that predictions for the same test
+         points (e.g., a validation set) after updates of the posterior do not recalculate the kernels. ``Xs`` should
+         not change between calls with the same key.
+
         Returns
         -------
         mean : ndarray
@@ -1282,10 +1617,11 @@ class SAVIGP(Model):
         """
 
         X_partitions, Y_partitions, n_partitions, partition_size = self._partition_data(Xs, Ys)
+        A_K = self._cached_predict_A_K(X_partitions, cache_key)
 
-        mu, var, nlpd = self._predict_comp(X_partitions[0], Y_partitions[0])
+        mu, var, nlpd = self._predict_comp(X_partitions[0], Y_partitions[0], A_K[0])
         for p in range(1, len(X_partitions)):
-            p_mu, p_var, p_nlpd = self._predict_comp(X_partitions[p], Y_partitions[p])
+            p_mu, p_var, p_nlpd = self._predict_comp(X_partitions[p], Y_partitions[p], A_K[p])
             mu = np.concatenate((mu, p_mu), axis=0)
             var = np.concatenate((var, p_var), axis=0)
             nlpd = np.concatenate((nlpd, p_nlpd), axis=0)
@@ -1,9 +1,9 @@
 __author__ = 'AT'
 
+import math
 from GPy.util.linalg import mdot
 from mog_diag import MoG_Diag
 from scipy.misc import logsumexp
-from util import log_diag_gaussian
 import numpy as np
 
 from savigp import SAVIGP
@@ -28,70 +28,26 @@ class SAVIGP_Diag(SAVIGP):
         return (mdot(s, np.square(A[j])) * self.MoG.pi[k] / 2.)
 
     def update_N_z(self):
-        self.log_z = np.zeros((self.num_mog_comp))
-        self.log_N_kl = np.zeros((self.num_mog_comp, self.num_mog_comp))
-        for k in range(self.num_mog_comp):
-            for l in range(self.num_mog_comp):
-                for j in range(self.num_latent_proc):
-                    self.log_N_kl[k, l] += log_diag_gaussian(self.MoG.m[k, j], self.MoG.m[l, j],
-                                                             logsumexp(
-                                                                 [self.MoG.log_s[k, j, :], self.MoG.log_s[l, j, :]],
-                                                                 axis=0))
-            self.log_z[k] = logsumexp(self.log_N_kl[k, :] + np.log(self.MoG.pi))
-
-    def _update(self):
-        self.update_N_z()
-        SAVIGP._update(self)
-
-    def mdot_Aj(self, Ajn, Kxnz):
-        return Ajn[0] * Ajn[0]
-
-    def _d_ent_d_m(self):
-        dent_dm = np.empty((self.num_mog_comp, self.num_latent_proc, self.num_inducing))
-        for k in range(self.num_mog_comp):
-            for j in range(self.num_latent_proc):
-                dent_dm[k, j, :] = self._d_ent_d_m_kj(k, j)
-        return dent_dm
-
-    def _d_ent_d_pi(self):
-        pi = np.empty(self.num_mog_comp)
-        for k in range(self.num_mog_comp):
-            pi[k] = -self.log_z[k]
-            for l in range(self.num_mog_comp):
-                pi[k] -= self.MoG.pi[l] * (np.exp(self.log_N_kl[k, l] - self.log_z[l]))
-        return pi
-
-    def _d_ent_d_S_kj(self, k, j):
         """
-        Calculates gradient of the entropy term of ELBO wrt to the posterior covariance for component ``k`` and latent
-        process ``j``. The returned gradient will be in the raw space.
+        Calculates log N(m[k] | m[l], s[k] + s[l]) for all pairs of components (``log_N_kl``), and
+        log z[k] = log sum_l pi[l] N(m[k] | m[l], s[k] + s[l]) (``log_z``), which are used in the entropy term.
+        Computations are vectorized over arrays of shape K * K * Q * M.
         """
-        s_k = np.zeros(self.MoG.S_dim())
-        for l in range(self.num_mog_comp):
-            s_k += self.MoG.pi[k] * self.MoG.pi[l] * (np.exp(self.log_N_kl[l, k] - self.log_z[k]) +
-                                                      np.exp(self.log_N_kl[l, k] - self.log_z[l])) * \
-                   self.MoG.C_m_C(j, k, l)
-        return 1. / 2 * s_k
-
-    def _d_ent_d_S(self):
-        r"""
-        Calculated gradient of the entropy term of ELBO wrt to the posterior covariance.
 
-        Returns
-        -------
-        ds : ndarray
-         dent \\ ds. Gradients will be in the raw space. Dimensions : K * Q * ``self.MoG.S_dim()``
+        log_s_k = self.MoG.log_s[:, np.newaxis]
+        log_s_l = self.MoG.log_s[np.newaxis, :]
+        a = np.maximum(log_s_k, log_s_l)
+        log_s_kl = a + np.log(np.exp(log_s_k - a) + np.exp(log_s_l - a))
+        d = self.MoG.m[:, np.newaxis] - self.MoG.m[np.newaxis, :]
+        log_N_klj = -1.0 / 2 * log_s_kl.sum(axis=3) - float(self.num_inducing) / 2 * np.log(2 * math.pi) \
+                    - 1.0 / 2 * np.einsum('klji,klji->klj', d / np.exp(log_s_kl), d)
+        self.log_N_kl = log_N_klj.sum(axis=2)
+        self.log_z = logsumexp(self.log_N_kl + np.log(self.MoG.pi), axis=1)
 
-        """
-        dent_ds = np.empty((self.num_mog_comp, self.num_latent_proc) + self.MoG.S_dim())
-        for k in range(self.num_mog_comp):
-            for j in range(self.num_latent_proc):
-                dent_ds[k, j] = self._d_ent_d_S_kj(k, j)
-        return dent_ds
+    def mdot_Aj(self, Ajn, Kxnz):
+        return Ajn[0] * Ajn[0]
 
     def _transformed_d_ent_d_S(self):
+        # ``MoG_Diag.C_m_C`` returns gradients in the raw space
         return (self._d_ent_d_S()).flatten()
 
-    def _l_ent(self):
-        return -np.dot(self.MoG.pi, self.log_z)
-
@@ -0,0 +1,50 @@
+__author__ = 'AT'
+
+from GPy.util.linalg import mdot
+from mog_full import MoG_Full
+from scipy.misc import logsumexp
+import numpy as np
+
+from savigp import SAVIGP
+
+
+class SAVIGP_Full(SAVIGP):
+    """
+    Implementation of the SAVIGP model in the case that posterior is a mixture of Gaussians with full covariance
+    matrices.
+    """
+
+    def __init__(self, X, Y, num_inducing, num_mog_comp, likelihood, kernels, n_samples, config_list,
+                 latent_noise, is_exact_ell, inducing_on_Xs, n_threads=1, image=None, partition_size=3000):
+        super(SAVIGP_Full, self).__init__(X, Y, num_inducing, num_mog_comp, likelihood,
+                                          kernels, n_samples, config_list, latent_noise, is_exact_ell,
+                                          inducing_on_Xs, n_threads, image, partition_size)
+
+    def _get_mog(self):
+        return MoG_Full(self.num_mog_comp, self.num_latent_proc, self.num_inducing)
+
+    def _dell_ds(self, k, j, cond_ll, A, sigma_kj, norm_samples):
+        return mdot(A[j].T * self._average(cond_ll, (norm_samples**2 - 1)/sigma_kj[k,j], True), A[j]) \
+                                                * self.MoG.pi[k] / 2.
+
+    def init_mog(self, init_m):
+        super(SAVIGP_Full, self).init_mog(init_m)
+        for j in range(self.num_latent_proc):
+            self.MoG.update_covariance(j, self.Kzz[j])
+
+    def update_N_z(self):
+        """
+        Calculates log N(m[k] | m[l], s[k] + s[l]) for all pairs of components (``log_N_kl``), and
+        log z[k] = log sum_l pi[l] N(m[k] | m[l], s[k] + s[l]) (``log_z``), using the decompositions cached in
+        ``MoG_Full``.
+        """
+
+        self.log_N_kl = np.zeros((self.num_mog_comp, self.num_mog_comp))
+        for k in range(self.num_mog_comp):
+            for l in range(self.num_mog_comp):
+                for j in range(self.num_latent_proc):
+                    self.log_N_kl[k, l] += self.MoG.log_pdf(j, k, l)
+        self.log_z = logsumexp(self.log_N_kl + np.log(self.MoG.pi), axis=1)
+
+    def mdot_Aj(self, Ajn, Kxnz):
+        return mdot(Ajn.T, Ajn)
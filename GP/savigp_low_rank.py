@@ -0,0 +1,32 @@
+__author__ = 'AT'
+
+from GPy.util.linalg import mdot
+from mog_low_rank import MoG_LowRank
+import numpy as np
+
+from savigp_full import SAVIGP_Full
+
+
+class SAVIGP_LowRank(SAVIGP_Full):
+    """
+    Implementation of the SAVIGP model in the case that posterior is a mixture of Gaussians, and the covariance matrix
+    of each component is the sum of a diagonal and a low-rank matrix (see ``MoG_LowRank``).
+    """
+
+    def __init__(self, X, Y, num_inducing, num_mog_comp, likelihood, kernels, n_samples, config_list,
+                 latent_noise, is_exact_ell, inducing_on_Xs, n_threads=1, image=None, partition_size=3000, rank=5):
+        self.rank = rank
+        super(SAVIGP_LowRank, self).__init__(X, Y, num_inducing, num_mog_comp, likelihood,
+                                             kernels, n_samples, config_list, latent_noise, is_exact_ell,
+                                             inducing_on_Xs, n_threads, image, partition_size)
+
+    def _get_mog(self):
+        return MoG_LowRank(self.num_mog_comp, self.num_latent_proc, self.num_inducing, self.rank)
+
+    def _dell_ds(self, k, j, cond_ll, A, sigma_kj, norm_samples):
+        s = self._average(cond_ll, (np.square(norm_samples) - 1) / sigma_kj[k, j], True) * self.MoG.pi[k] / 2.
+        return self.MoG.raw_S_grad(mdot(s, np.square(A[j])), mdot(A[j].T * s, mdot(A[j], self.MoG.V[k, j])), k, j)
+
+    def _transformed_d_ent_d_S(self):
+        # ``MoG_LowRank.C_m_C`` returns gradients in the raw space
+        return (self._d_ent_d_S()).flatten()
@@ -1,124 +1,125 @@
 __author__ = 'AT'
 
-
-from GPy.util.linalg import mdot
 import math
-from numpy.linalg import inv
+from GPy.util.linalg import mdot
+from scipy.linalg import solve_triangular
 from savigp_single_comp import SAVIGP_SingleComponent
-from savigp import SAVIGP, Configuration
+from savigp import Configuration
+from util import chol_backward
 import numpy as np
 
+
 class SAVIGP_Reparam(SAVIGP_SingleComponent):
+    """
+    Implementation of SAVIGP in the whitened parameterisation, i.e., the inducing variables are represented as
+    u[j] = L[j] v[j], where L[j] is the Cholesky decomposition of K(Z[j], Z[j]), and the posterior distribution (MoG) is
+    defined over v[j], which has the prior N(0, I). The posterior has a single component with full covariance.
+
+    In this parameterisation:
+
+     A[j] = K(X, Z[j]) L[j]^-T,  Ktilda[j] = K(X, X) - diag(A[j] A[j]^T)
+
+    and the cross term does not depend on the hyper-parameters or the inducing points. Gradients of ell wrt to the
+    hyper-parameters and the inducing points are calculated by back-propagating dell \\ dA[j] through the triangular
+    solve and the Cholesky decomposition.
+    """
 
     def init_mog(self, init_m):
-        super(SAVIGP_SingleComponent, self).init_mog(init_m)
         for j in range(self.num_latent_proc):
-            self.MoG.update_covariance(j, inv(self.Kzz[j] + 0.001))
+            self.MoG.update_mean(j, solve_triangular(self.chol[j], init_m[:, j], lower=True))
+            self.MoG.update_covariance(j, np.eye(self.num_inducing))
 
-    def _proj_m_grad(self, j, dl_dm):
-        return dl_dm
+    def _A(self, j, K):
+        return solve_triangular(self.chol[j, :, :], K, lower=True).T
 
-    def mdot_Aj(self, Ajn, Kxnz):
-        return mdot(Kxnz.T, Kxnz)
+    def _Kdiag(self, p_X, K, A, j):
+        return self.kernels[j].Kdiag(p_X) + self.latent_noise - np.square(A).sum(axis=1)
 
-    def _b_n(self, n, j, Aj, Kzx):
-        """
-        calculating [b_k(n)]j for latent process j (eq 19) for all k
-        returns: a
-        """
-        return mdot(Kzx[n, :], self.MoG.m[:, j, :].T)
-
-    def _sigma_n(self, n, j, Kj, Aj, Kzx):
-        """
-        calculating [sigma_k(n)]j,j for latent process j (eq 20) for all k
-        """
-        if Kj[n] < 0:
-            Kj[n] = 0
-        return Kj[n] + self.MoG.aSa(Kzx[n, :], j)
+    def _proj_m_grad(self, j, dl_dm):
+        return solve_triangular(self.chol[j, :, :], dl_dm, lower=True)
 
+    def calculate_dhyper(self):
+        # in this parameterisation ell depends on the hyper-parameters even when the model is not sparse
+        return Configuration.HYPER in self.config_list
 
     def _dcorss_dm(self):
-        """
-        calculating d corss / dm
-        """
         dcdm = np.empty((self.num_mog_comp, self.num_latent_proc, self.num_inducing))
         for j in range(self.num_latent_proc):
-            dcdm[:, j, :] = -mdot(self.Kzz[j, :, :], self.MoG.m[:, j, :].T).T * self.MoG.pi[:, np.newaxis]
+            dcdm[:, j, :] = -self.MoG.m[:, j, :] * self.MoG.pi[:, np.newaxis]
         return dcdm
 
     def _dcross_ds(self):
-        """
-        calculating L_corss by s_k for all k's
-        """
+        eye = np.eye(self.num_inducing)
         dc_ds = np.empty((self.num_mog_comp, self.num_latent_proc, self.MoG.get_sjk_size()))
         for j in range(self.num_latent_proc):
             dc_ds[:, j] = -1. / 2 * np.array(
-                [self.MoG.dAS_dS(self.Kzz[j, :, :], k, j) * self.MoG.pi[k] for k in range(self.num_mog_comp)])
+                [self.MoG.dAS_dS(eye, k, j) * self.MoG.pi[k] for k in range(self.num_mog_comp)])
         return dc_ds
 
-    def transform_dcorss_dS(self):
-        return self._dcross_ds().flatten()
-
     def _cross_dcorss_dpi(self, N):
         """
-        calculating L_corss by pi_k, and also calculates the cross term
-        :returns d cross / d pi, cross
+        Returns
+        --------
+        cross : float
+         the cross term of ELBO, which in this parameterisation is E[log N(v | 0, I)]
+
+        d_pi : ndarray
+         dcross \\ dpi
         """
-        cross = 0
+        eye = np.eye(self.num_inducing)
         d_pi = np.zeros(self.num_mog_comp)
         for j in range(self.num_latent_proc):
             for k in range(self.num_mog_comp):
-                d_pi[k] += \
-                    N * math.log(2 * math.pi) + \
-                    self.log_detZ[j] + \
-                    mdot(self.MoG.m[k, j, :].T, self.Kzz[j, :, :], self.MoG.m[k, j, :].T) + \
-                    self.MoG.tr_AS(self.Kzz[j, :, :], k, j)
-        for k in range(self.num_mog_comp):
-            cross += self.MoG.pi[k] * d_pi[k]
-
+                d_pi[k] += N * math.log(2 * math.pi) + \
+                    np.dot(self.MoG.m[k, j], self.MoG.m[k, j]) + \
+                    self.MoG.tr_AS(eye, k, j)
+        cross = -1. / 2 * np.dot(self.MoG.pi, d_pi)
         d_pi *= -1. / 2
-        cross *= -1. / 2
         return cross, d_pi
 
-    def _dcross_K(self, j):
-        dc_dK = np.zeros((self.num_inducing, self.num_inducing))
-        for k in range(self.num_mog_comp):
-            dc_dK += -0.5 * self.MoG.pi[k] * (self.invZ[j]
-                                              + mdot(self.MoG.m[k, j, :, np.newaxis], self.MoG.m[k, j, :, np.newaxis].T) +
-                                              self.MoG.s[k, j, :, :]
+    def _dcross_dhyper(self):
+        return np.zeros((self.num_latent_proc, self.num_hyper_params))
 
-                                              )
-        return dc_dK
+    def _dcross_dinducing(self):
+        return np.zeros((self.num_latent_proc, self.num_inducing, self.input_dim))
 
-    def _dent_dhyper(self):
-        dc_dh = np.empty((self.num_latent_proc, self.num_hyper_params))
-        for j in range(self.num_latent_proc):
-            self.kernels_latent[j].update_gradients_full(self.invZ[j], self.Z[j])
-            dc_dh[j] = self.kernels[j].gradient.copy()
-        return dc_dh
+    def _dell_dK_kj(self, k, j, cond_ll, norm_samples, sigma_kj, A, X):
+        r"""
+        Calculates gradients of ell on partition ``X``, through component ``k``, wrt to the kernels of latent process
+        ``j``. ell depends on the kernels through b = A m[k,j] and sigma = Kdiag - diag(A A^T) + diag(A s[k,j] A^T):
 
-    def _l_ent(self):
-        ent = -np.dot(self.MoG.pi,  self.log_z)
-        for j in range(self.num_latent_proc):
-            ent += self.log_detZ[j]
-        return ent
+         dell \\ dA = g_b m^T + 2 diag(g_sigma) A (s[k,j] - I)
 
-    def _dsigma_n_dhyp(self, j, k, A, Kxnz, n, xn):
-        return self.dKx_dhyper(j, xn) \
-               - self.dA_dhyper_n_mult_x(xn, j, A[j, n], -Kxnz.T) \
-               - self.dKzxn_dhyper_mult_x(j, xn, A[j, n]) + \
-               2 * self.dKzxn_dhyper_mult_x(j, xn, self.MoG.Sa(Kxnz, k, j))
+        which is then back-propagated through A^T = L^-1 K(Z, X) and L = chol(K(Z, Z)).
 
-    def _db_n_dhyp(self, j, k, A, n, xn):
-        return self.dKzxn_dhyper_mult_x(j, xn, self.MoG.m[k, j])
+        Returns
+        -------
+        dK_zx : ndarray
+         dell \\ dK(Z[j], X). Dimensions: M * P
 
-    def calculate_dhyper(self):
-        return Configuration.HYPER in self.config_list
-
-    def dKzxn_dhyper_mult_x(self, j, x_n, x):
-        self.kernels[j].update_gradients_full(x[:, np.newaxis], self.Z[j], x_n)
-        return self.kernels[j].gradient.copy()
+        dK_zz : ndarray
+         dell \\ dK(Z[j], Z[j]). Dimensions: M * M
 
-    def dKx_dhyper(self, j, x_n):
-        self.kernels[j].update_gradients_full(np.array([[1]]), x_n)
-        return self.kernels[j].gradient.copy()
+        dK_diag : ndarray
+         dell \\ dKdiag(X). Dimensions: P
+        """
+        g_sigma = -1. / 2 * self.MoG.pi[k] * \
+            self._average(cond_ll, (1. - np.square(norm_samples)) / sigma_kj[k, j], True)
+        g_b = self.MoG.pi[k] * self._average(cond_ll, norm_samples / np.sqrt(sigma_kj[k, j]), True)
+        Aj = A[j]
+        dA = np.outer(g_b, self.MoG.m[k, j]) + 2. * (self.MoG.Sa(Aj.T, k, j).T - Aj) * g_sigma[:, np.newaxis]
+        L = self.chol[j, :, :]
+        L_inv_T_dA_T = solve_triangular(L, dA.T, lower=True, trans=1)
+        return L_inv_T_dA_T, chol_backward(L, -mdot(L_inv_T_dA_T, Aj)), g_sigma
+
+    def _dell_dhyper_kj(self, k, j, cond_ll, norm_samples, sigma_kj, A, Kzx, X):
+        dK_zx, dK_zz, dK_diag = self._dell_dK_kj(k, j, cond_ll, norm_samples, sigma_kj, A, X)
+        self.kernels[j].update_gradients_full(dK_zx, self.Z[j], X)
+        d_hyper = self.kernels[j].gradient.copy()
+        self.kernels[j].update_gradients_full(dK_zz, self.Z[j])
+        d_hyper += self.kernels[j].gradient
+        return d_hyper + mdot(dK_diag, self.kernels[j].get_gradients_Kdiag(X))
+
+    def _dell_dinduc_kj(self, k, j, cond_ll, norm_samples, sigma_kj, A, Kzx, X):
+        dK_zx, dK_zz, dK_diag = self._dell_dK_kj(k, j, cond_ll, norm_samples, sigma_kj, A, X)
+        return self.kernels[j].gradients_X(dK_zx, self.Z[j], X) + self.kernels[j].gradients_X(dK_zz, self.Z[j])
@@ -34,10 +34,6 @@ class SAVIGP_SingleComponent(SAVIGP):
         for j in range(self.num_latent_proc):
             self.MoG.update_covariance(j, self.Kzz[j])
 
-    def _update(self):
-        self.update_N_z()
-        SAVIGP._update(self)
-
     def mdot_Aj(self, Ajn, Kxnz):
         return mdot(Ajn.T, Ajn)
 
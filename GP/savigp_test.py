@@ -6,6 +6,9 @@ from data_transformation import IdentityTransformation
 from model_learn import ModelLearn
 from plot_results import PlotOutput
 from savigp_diag import SAVIGP_Diag
+from savigp_full import SAVIGP_Full
+from savigp_low_rank import SAVIGP_LowRank
+from savigp_reparam import SAVIGP_Reparam
 from savigp_single_comp import SAVIGP_SingleComponent
 from copy import deepcopy
 import GPy
@@ -97,6 +100,84 @@ class SAVIGP_Test:
 
         return GradChecker.check(f, f_grad, s1.get_params(), s1.get_param_names(), verbose=verbose)
 
+    @staticmethod
+    def test_grad_full(config, verbose, sparse, likelihood_type):
+        num_input_samples = 3
+        num_samples = 100000
+        cov, gaussian_sigma, ll, num_process = SAVIGP_Test.get_cond_ll(likelihood_type)
+        np.random.seed(111)
+        if sparse:
+            num_inducing = num_input_samples - 1
+        else:
+            num_inducing = num_input_samples
+        X, Y, kernel = DataSource.normal_generate_samples(num_input_samples, cov)
+        s1 = SAVIGP_Full(X, Y, num_inducing, 2, ll,
+                         [deepcopy(kernel) for j in range(num_process)], num_samples, config, 0, True, True)
+
+        s1.rand_init_mog()
+
+        def f(x):
+            s1.set_params(x)
+            return s1.objective_function()
+
+        def f_grad(x):
+            s1.set_params(x)
+            return s1.objective_function_gradients()
+
+        return GradChecker.check(f, f_grad, s1.get_params(), s1.get_param_names(), verbose=verbose)
+
+    @staticmethod
+    def test_grad_low_rank(config, verbose, sparse, likelihood_type):
+        num_input_samples = 3
+        num_samples = 100000
+        cov, gaussian_sigma, ll, num_process = SAVIGP_Test.get_cond_ll(likelihood_type)
+        np.random.seed(111)
+        if sparse:
+            num_inducing = num_input_samples - 1
+        else:
+            num_inducing = num_input_samples
+        X, Y, kernel = DataSource.normal_generate_samples(num_input_samples, cov)
+        s1 = SAVIGP_LowRank(X, Y, num_inducing, 2, ll,
+                            [deepcopy(kernel) for j in range(num_process)], num_samples, config, 0, True, True, rank=1)
+
+        s1.rand_init_mog()
+
+        def f(x):
+            s1.set_params(x)
+            return s1.objective_function()
+
+        def f_grad(x):
+            s1.set_params(x)
+            return s1.objective_function_gradients()
+
+        return GradChecker.check(f, f_grad, s1.get_params(), s1.get_param_names(), verbose=verbose)
+
+    @staticmethod
+    def test_grad_reparam(config, verbose, sparse, likelihood_type):
+        num_input_samples = 3
+        num_samples = 100000
+        cov, gaussian_sigma, ll, num_process = SAVIGP_Test.get_cond_ll(likelihood_type)
+        np.random.seed(111)
+        if sparse:
+            num_inducing = num_input_samples - 1
+        else:
+            num_inducing = num_input_samples
+        X, Y, kernel = DataSource.normal_generate_samples(num_input_samples, cov)
+        s1 = SAVIGP_Reparam(X, Y, num_inducing, ll,
+                            [deepcopy(kernel) for j in range(num_process)], num_samples, config, 0, True, True)
+
+        s1.rand_init_mog()
+
+        def f(x):
+            s1.set_params(x)
+            return s1.objective_function()
+
+        def f_grad(x):
+            s1.set_params(x)
+            return s1.objective_function_gradients()
+
+        return GradChecker.check(f, f_grad, s1.get_params(), s1.get_param_names(), verbose=verbose)
+
     @staticmethod
     def report_output(config, error, model):
         if error < 0.1:
@@ -155,7 +236,7 @@ class SAVIGP_Test:
         ]
 
         sparse = [False, True]
-        models = ['diag', 'full']
+        models = ['diag', 'full', 'full_mix', 'low_rank', 'reparam']
         ll = ['univariate_Gaussian', 'multi_Gaussian']
 
         for m in models:
@@ -169,10 +250,61 @@ class SAVIGP_Test:
                                 e1 = SAVIGP_Test.test_grad_diag(c, True, s, l)
                             if m == 'full':
                                 e1 = SAVIGP_Test.test_grad_single(c, True, s, l)
+                            if m == 'full_mix':
+                                e1 = SAVIGP_Test.test_grad_full(c, True, s, l)
+                            if m == 'low_rank':
+                                e1 = SAVIGP_Test.test_grad_low_rank(c, True, s, l)
+                            if m == 'reparam':
+                                e1 = SAVIGP_Test.test_grad_reparam(c, True, s, l)
                             SAVIGP_Test.report_output(c, e1, 'model: ' + m + ', ' + ' sparse:' + str(s) + ', ' + ', '
                                                       + 'likelihood: ' + l)
 
 
+    @staticmethod
+    def test_grad_large(method='full', num_input_samples=1000, num_inducing=50, num_coords=20, num_samples=10000,
+                        n_processes=None, verbose=True):
+        """
+        Checks gradients of a model of realistic size wrt to all the parameters, along random directions and on a
+        sample of the parameters, using a pool of processes for finite differences. Gradients of ell are estimated
+        using ``num_samples`` samples, and therefore the error of the check decreases with ``num_samples``.
+        ``method`` can be 'full', 'diag', 'full_mix', 'low_rank' or 'reparam' (see ``test_grad``).
+        """
+        cov, gaussian_sigma, ll, num_process = SAVIGP_Test.get_cond_ll('univariate_Gaussian')
+        np.random.seed(111)
+        X, Y, kernel = DataSource.normal_generate_samples(num_input_samples, cov)
+        config = [Configuration.MoG, Configuration.ENTROPY, Configuration.CROSS, Configuration.ELL,
+                  Configuration.HYPER, Configuration.LL, Configuration.INDUCING]
+        kernels = [deepcopy(kernel) for j in range(num_process)]
+        if method == 'full':
+            s1 = SAVIGP_SingleComponent(X, Y, num_inducing, ll, kernels, num_samples, config, 0.001, True, True)
+        elif method == 'diag':
+            s1 = SAVIGP_Diag(X, Y, num_inducing, 2, ll, kernels, num_samples, config, 0.001, True, True)
+        elif method == 'full_mix':
+            s1 = SAVIGP_Full(X, Y, num_inducing, 2, ll, kernels, num_samples, config, 0.001, True, True)
+        elif method == 'low_rank':
+            s1 = SAVIGP_LowRank(X, Y, num_inducing, 2, ll, kernels, num_samples, config, 0.001, True, True)
+        elif method == 'reparam':
+            s1 = SAVIGP_Reparam(X, Y, num_inducing, ll, kernels, num_samples, config, 0.001, True, True)
+        else:
+            raise ValueError('unknown method: ' + str(method))
+
+        s1.rand_init_mog()
+
+        def f(x):
+            s1.set_params(x)
+            return s1.objective_function()
+
+        def f_grad(x):
+            s1.set_params(x)
+            return s1.objective_function_gradients()
+
+        x0 = s1.get_params()
+        e1 = GradChecker.check_directional(f, f_grad, x0, verbose=verbose, n_processes=n_processes)
+        SAVIGP_Test.report_output(config, e1, 'model: ' + method + ', directional')
+        e2 = GradChecker.check(f, f_grad, x0, s1.get_param_names(), verbose=verbose, num_coords=num_coords,
+                               n_processes=n_processes)
+        SAVIGP_Test.report_output(config, e2, 'model: ' + method + ', sampled coordinates')
+
     @staticmethod
     def gpy_prediction(X, Y, vairiance, kernel):
         m = GPy.core.GP(X, Y, kernel=kernel, likelihood=GPy.likelihoods.Gaussian(None, vairiance))
@@ -275,5 +407,6 @@ class SAVIGP_Test:
 
 if __name__ == '__main__':
     SAVIGP_Test.test_grad()
+    # SAVIGP_Test.test_grad_large('full')
     # SAVIGP_Test.test_gp(True, method='full')
     # SAVIGP_Test.test_model_learn({'method': 'full', 'sparse_factor': 1.0})
@@ -2,6 +2,7 @@ import math
 import os
 import random
 import string
+import time
 from numpy.core.umath_tests import inner1d
 from numpy.ma import trace
 from scipy import linalg
@@ -41,34 +42,101 @@ def cross_ent_normal(m1, sigma1, m2, sigma2):
     return -KL_normal(m1, sigma1, m2, sigma2) - 1. / 2 * math.log(det(2.0 * math.pi * math.e * sigma1))
 
 
-def jitchol(A, maxtries=5):
+# counters of the work done by ``jitchol`` in retries; see ``jitchol_stats`` and ``reset_jitchol_stats``
+_jitchol_stats = {'calls': 0, 'failed_attempts': 0, 'jittered_calls': 0, 'retry_time': 0.}
+
+
+def jitchol(A, maxtries=5, memory=None, key=None):
     """
     Calculates the Cholesky decomposition of ``A``. In the case that it is not possible to calculate the Cholesky,
-    a jitter will be added to ``A``.
+    a jitter will be added to ``A``. The jitters are mean(diag(A)) * 1e-6 * 10^i for i = 0, ..., ``maxtries`` - 1.
+
+    If ``memory`` is provided, the step of the jitter which worked is remembered under ``key``, and the next
+    decomposition with the same key starts one step below it (or from the plain decomposition if that is the first
+    step), which avoids walking through the same failing attempts when ``A`` stays nearly singular over an
+    optimisation. The remembered jitter therefore decays by one step every time a smaller jitter works, and is
+    forgotten when the plain decomposition works.
+
+    Parameters
+    ----------
+    A : ndarray
+     a symmetric matrix
+
+    maxtries : integer
+     maximum number of attempts with increasing jitter
+
+    memory : dictionary (optional)
+     the remembered jitters. It should be owned by the object whose matrices are decomposed (e.g., a model or a
+     posterior distribution), so that unrelated matrices do not share jitters.
+
+    key : hashable
+     the key of ``A`` in ``memory``, which should identify the matrix, e.g., ('Kzz', j)
+
+    Raises
+    ------
+    JitChol
+     if the decomposition fails with the largest jitter
 
     Note
     ----
     This method is adopted from the GPy package
     """
 
+    _jitchol_stats['calls'] += 1
     A = np.ascontiguousarray(A)
-    L, info = lapack.dpotrf(A, lower=1)
-    if info == 0:
-        return L
-    else:
+    step = None
+    if memory is not None and key in memory:
+        step = memory[key] - 1
+    if step is None or step < 0:
+        L, info = lapack.dpotrf(A, lower=1)
+        if info == 0:
+            if memory is not None:
+                memory.pop(key, None)
+            return L
+        _jitchol_stats['failed_attempts'] += 1
+        step = 0
+
+    start = time.time()
+    _jitchol_stats['jittered_calls'] += 1
+    try:
         diagA = np.diag(A)
         if np.any(diagA <= 0.):
             raise JitChol, "not pd: non-positive diagonal elements"
-        jitter = diagA.mean() * 1e-6
-        while maxtries > 0 and np.isfinite(jitter):
-            try:
-                L = linalg.cholesky(A + np.eye(A.shape[0]) * jitter, lower=True)
+        while step < maxtries:
+            jitter = diagA.mean() * 1e-6 * 10 ** step
+            if not np.isfinite(jitter):
+                break
+            L, info = lapack.dpotrf(A + np.eye(A.shape[0]) * jitter, lower=1)
+            if info == 0:
+                if memory is not None:
+                    memory[key] = step
                 return L
-            except:
-                jitter *= 10
-            finally:
-                maxtries -= 1
+            _jitchol_stats['failed_attempts'] += 1
+            step += 1
+        if memory is not None:
+            memory.pop(key, None)
         raise JitChol, "not positive definite, even with jitter."
+    finally:
+        _jitchol_stats['retry_time'] += time.time() - start
+
+
+def jitchol_stats():
+    """
+    :returns: a copy of the counters of ``jitchol``: number of calls, number of calls which needed a jitter, failed
+     decomposition attempts, and the total time spent in retries
+    """
+
+    return dict(_jitchol_stats)
+
+
+def reset_jitchol_stats():
+    """
+    Resets the counters of ``jitchol``.
+    """
+
+    for key in _jitchol_stats:
+        _jitchol_stats[key] = 0
+    _jitchol_stats['retry_time'] = 0.
 
 
 def pddet(L):
@@ -97,6 +165,15 @@ def inv_chol(L):
     return Ai
 
 
+def inv_chol_diag(L):
+    """
+    Given that ``L`` is the Cholesky decomposition of A, this method returns diag(A^-1) without forming A^-1, i.e.,
+    using the fact that A^-1 = L^-T L^-1 and therefore diag(A^-1) is the column sums of (L^-1)^2.
+    """
+
+    return np.square(linalg.solve_triangular(L, np.eye(L.shape[0]), lower=True)).sum(axis=0)
+
+
 def chol_grad(L, dM_dx):
     """
     Given that ``L`` is the Cholesky decomposition of x, and ``dM_dx`` is the gradient of M wrt to x,
@@ -114,6 +191,27 @@ def chol_grad(L, dM_dx):
     return mdot(dM_dx+dM_dx.T, L)
 
 
+def chol_backward(L, dM_dL):
+    """
+    Given that ``L`` is the Cholesky decomposition of x, and ``dM_dL`` is the gradient of M wrt to L (only the
+    lower-triangular part is used), then this function calculates dM \\ dx, i.e., the reverse of ``chol_grad``:
+
+     dM \\ dx = 1/2 (L^-T Phi(L^T dM_dL) L^-1 + (L^-T Phi(L^T dM_dL) L^-1)^T)
+
+    where Phi takes the lower-triangular part of a matrix and halves its diagonal.
+
+    Returns
+    -------
+    dM_dx : ndarray
+     dM \\ dx, which is symmetric
+    """
+
+    P = np.tril(mdot(L.T, np.tril(dM_dL)))
+    P[np.diag_indices_from(P)] /= 2.
+    P = linalg.solve_triangular(L, linalg.solve_triangular(L, P, lower=True, trans=1).T, lower=True, trans=1)
+    return (P + P.T) / 2.
+
+
 def log_diag_gaussian(m1, m2, s_log):
     """
     Returns PDF of a normal distribution as follows: